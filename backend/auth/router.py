@@ -5,26 +5,27 @@ from core.security import verify_password, get_password_hash, create_access_toke
 from core.database import users_collection
 from core.config import settings
 from core.dependencies import get_current_user
+from core.executors import run_cpu, run_io
 
 router = APIRouter()
 
 @router.post("/register", response_model=User)
 async def register(user: UserCreate):
     # Check if user already exists
-    if users_collection.find_one({"username": user.username}):
+    if await run_io(users_collection.find_one, {"username": user.username}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    if users_collection.find_one({"email": user.email}):
+    if await run_io(users_collection.find_one, {"email": user.email}):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Hash password and create user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await run_cpu(get_password_hash, user.password)
     user_doc = {
         "username": user.username,
         "email": user.email,
@@ -33,7 +34,7 @@ async def register(user: UserCreate):
         "is_active": True
     }
     
-    users_collection.insert_one(user_doc)
+    await run_io(users_collection.insert_one, user_doc)
     
     return User(
         username=user.username,
@@ -44,9 +45,9 @@ async def register(user: UserCreate):
 
 @router.post("/login", response_model=Token)
 async def login(user_credentials: UserLogin):
-    user = users_collection.find_one({"username": user_credentials.username})
+    user = await run_io(users_collection.find_one, {"username": user_credentials.username})
     
-    if not user or not verify_password(user_credentials.password, user["hashed_password"]):
+    if not user or not await run_cpu(verify_password, user_credentials.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
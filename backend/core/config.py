@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     # Authentication
@@ -21,6 +21,66 @@ class Settings(BaseSettings):
     # Paths
     AI_CLASSIFICATION_PATH: str = "ai calsssifcation"
     
+    # PDF text extraction: worker processes (0 uses one per core) and per-file text cache
+    PDF_EXTRACT_WORKERS: int = 0
+    PDF_TEXT_CACHE_PATH: str = "pdf_text_cache"
+    
+    # Blocking work executors (CPU_EXECUTOR_WORKERS=0 uses one thread per core)
+    CPU_EXECUTOR_WORKERS: int = 0
+    VISION_EXECUTOR_WORKERS: int = 1
+    IO_EXECUTOR_WORKERS: int = 16
+    
+    # Concurrent token-streaming LLM responses (?stream=true), the others wait for a slot
+    LLM_STREAM_CONCURRENCY: int = 8
+    
+    # Model registry: models loaded at startup (the others load on first use)
+    # and idle time in seconds after which a model is evicted (unlisted: never)
+    MODEL_WARMUP: List[str] = ["all-MiniLM-L6-v2", "paraphrase-MiniLM-L6-v2"]
+    MODEL_IDLE_EVICT_SECONDS: Dict[str, float] = {}
+    MODEL_EVICTION_INTERVAL_SECONDS: float = 60.0
+    
+    # Query encoder backend: torch, torch_int8, onnx, onnx_int8
+    ENCODER_BACKEND: str = "torch"
+    ENCODER_ONNX_INT8_FILE: str = "onnx/model_qint8_avx512_vnni.onnx"
+    
+    # Query encoding micro-batching
+    ENCODER_BATCH_MAX_WAIT_MS: float = 5.0
+    ENCODER_BATCH_MAX_SIZE: int = 64
+    ENCODER_QUEUE_MAX_SIZE: int = 1024
+    
+    # Query embedding cache (384-float vectors are ~1.5 KB each)
+    EMBEDDING_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    
+    # Serialized /hscode/search response cache (TTL of 0 disables expiry)
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    RESULT_CACHE_TTL_SECONDS: float = 0
+    
+    # Most line items accepted by one /hscode/search/batch request (larger ones get 413)
+    SEARCH_BATCH_MAX_SIZE: int = 100
+    
+    # Load /hscode/search tables from data/snapshot when the source CSV hashes match
+    SEARCH_SNAPSHOT_ENABLED: bool = True
+    
+    # FAISS index variants: flat, flat_fp16, ivf, ivf_fp16, ivfpq, hnsw
+    FAISS_INDEX_TYPE: str = "flat"
+    SEARCH_INDEX_TYPE: str = "flat"
+    FAISS_IVF_NLIST: int = 1024
+    FAISS_IVF_NPROBE: int = 16
+    FAISS_PQ_M: int = 48
+    FAISS_PQ_NBITS: int = 8
+    FAISS_HNSW_M: int = 32
+    FAISS_HNSW_EF_CONSTRUCTION: int = 200
+    FAISS_HNSW_EF_SEARCH: int = 64
+    # Rewrite the base index once its delta log exceeds this fraction of the vectors
+    FAISS_DELTA_COMPACT_RATIO: float = 0.25
+    
+    # Threads loading the independent search artifacts at startup and on reload
+    STARTUP_LOAD_WORKERS: int = 6
+    
+    # Hot reload of the search indexes
+    ADMIN_USERNAMES: List[str] = []
+    RELOAD_DRAIN_TIMEOUT_SECONDS: float = 30.0
+    
     class Config:
         env_file = ".env"
 
@@ -1,13 +1,15 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from core.config import settings
 from core.security import verify_token
 from core.database import users_collection
+from core.executors import run_io
 
 security = HTTPBearer()
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     username = verify_token(credentials.credentials)
-    user = users_collection.find_one({"username": username})
+    user = await run_io(users_collection.find_one, {"username": username})
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -21,4 +23,14 @@ async def get_current_user_optional(credentials: HTTPAuthorizationCredentials =
     try:
         return await get_current_user(credentials)
     except HTTPException:
-        return None
\ No newline at end of file
+        return None
+
+
+# Dependency for maintenance endpoints (index reloads and the like)
+async def get_current_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    if not current_user.get("is_admin") and current_user.get("username") not in settings.ADMIN_USERNAMES:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required",
+        )
+    return current_user
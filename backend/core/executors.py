@@ -0,0 +1,68 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import settings
+
+
+class BoundedExecutor:
+    """Thread pool for one kind of blocking work, awaited from async handlers.
+
+    The number of workers is the concurrency limit for that kind of work, so a
+    burst of slow LLM calls queues behind its own limit instead of starving
+    the encode/FAISS work that fast search requests need.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on this pool and await its result"""
+        with self._lock:
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "in_flight": self._pending,
+            "completed": self._completed
+        }
+
+
+# CPU-bound encode / FAISS / in-memory lookups
+cpu_executor = BoundedExecutor("cpu", settings.CPU_EXECUTOR_WORKERS or os.cpu_count() or 4)
+# Vision models (Florence-2) on GPU or CPU
+vision_executor = BoundedExecutor("vision", settings.VISION_EXECUTOR_WORKERS)
+# I/O-bound calls: Ollama / LLM HTTP, MongoDB, filesystem walks
+io_executor = BoundedExecutor("io", settings.IO_EXECUTOR_WORKERS)
+
+
+async def run_cpu(fn, *args, **kwargs):
+    return await cpu_executor.run(fn, *args, **kwargs)
+
+
+async def run_vision(fn, *args, **kwargs):
+    return await vision_executor.run(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await io_executor.run(fn, *args, **kwargs)
+
+
+def executor_stats():
+    return [executor.stats() for executor in (cpu_executor, vision_executor, io_executor)]
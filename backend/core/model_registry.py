@@ -0,0 +1,189 @@
+import asyncio
+import gc
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.config import settings
+from core.readiness import ComponentTracker
+
+
+def module_tensors(module):
+    """Parameters, buffers and dynamically quantized packed weights of a torch module"""
+    for _, tensor in module.named_parameters():
+        yield tensor
+    for _, tensor in module.named_buffers():
+        yield tensor
+    # Quantized Linear layers keep their weights packed, outside parameters and buffers
+    for submodule in module.modules():
+        packed = getattr(submodule, "_packed_params", None)
+        if hasattr(packed, "_weight_bias"):
+            yield from (tensor for tensor in packed._weight_bias() if tensor is not None)
+
+
+def tensors_nbytes(tensors):
+    """Bytes of the distinct storages behind the tensors (shared or tied weights counted once)"""
+    storages = {}
+    for tensor in tensors:
+        try:
+            storage = tensor.untyped_storage()
+            storages[storage.data_ptr()] = storage.nbytes()
+        except (RuntimeError, NotImplementedError):
+            storages[id(tensor)] = tensor.numel() * tensor.element_size()
+    return sum(storages.values())
+
+
+def model_nbytes(model):
+    """Bytes held by the tensors of a model (torch modules, tuples of them, langchain wrappers)"""
+    if isinstance(model, (tuple, list)):
+        return sum(model_nbytes(part) for part in model)
+    if hasattr(model, "named_parameters") and hasattr(model, "named_buffers"):
+        return tensors_nbytes(module_tensors(model))
+    if hasattr(model, "client"):
+        return model_nbytes(model.client)
+    return 0
+
+
+def rss_bytes():
+    """Resident set size of the process, or None where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def release_memory():
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class ModelEntry:
+    def __init__(self, name, loader, idle_evict_seconds=None):
+        self.name = name
+        self.loader = loader
+        self.idle_evict_seconds = idle_evict_seconds
+        self.model = None
+        self.lock = threading.Lock()
+        self.loads = 0
+        self.uses = 0
+        self.last_used = None
+        self.load_seconds = None
+        self.param_bytes = 0
+        self.rss_delta_bytes = None
+
+
+class ModelRegistry:
+    """Process-wide models, loaded once on first use (or warmup) and shared across routers.
+
+    Callers fetch the model with `get(name)` each time they use it instead of
+    keeping their own reference, so an evicted model is actually freed and
+    transparently reloaded on its next use.
+    """
+
+    def __init__(self):
+        self._entries = {}
+
+    def register(self, name, loader, idle_evict_seconds=None):
+        """Declare a model and how to load it; nothing is loaded yet"""
+        if idle_evict_seconds is None:
+            idle_evict_seconds = settings.MODEL_IDLE_EVICT_SECONDS.get(name)
+        if name not in self._entries:
+            self._entries[name] = ModelEntry(name, loader, idle_evict_seconds)
+        return name
+
+    def get(self, name):
+        """The loaded model, loading it first if needed"""
+        entry = self._entries[name]
+        entry.last_used = time.monotonic()
+        entry.uses += 1
+        model = entry.model
+        if model is not None:
+            return model
+
+        with entry.lock:
+            if entry.model is None:
+                rss_before = rss_bytes()
+                started = time.perf_counter()
+                entry.model = entry.loader()
+                entry.load_seconds = time.perf_counter() - started
+                rss_after = rss_bytes()
+                entry.rss_delta_bytes = rss_after - rss_before if rss_before is not None else None
+                entry.param_bytes = model_nbytes(entry.model)
+                entry.loads += 1
+                print(f"Model {name} loaded in {entry.load_seconds:.2f}s")
+            return entry.model
+
+    def peek(self, name):
+        """The model if it is loaded, without loading it or counting a use"""
+        entry = self._entries.get(name)
+        return entry.model if entry is not None else None
+
+    def warmup(self, names, tracker=None):
+        """Load the given registered models now, concurrently; failures are reported, not raised"""
+        tracker = tracker if tracker is not None else ComponentTracker()
+        tracker.expect(*(f"model:{name}" for name in names), required=False)
+
+        def load(name):
+            try:
+                with tracker.track(f"model:{name}", required=False):
+                    if name not in self._entries:
+                        raise KeyError(f"unregistered model {name}")
+                    self.get(name)
+            except Exception as e:
+                print(f"Warning: could not load model {name}: {str(e)}")
+
+        with ThreadPoolExecutor(max_workers=max(1, len(names)), thread_name_prefix="warmup") as pool:
+            list(pool.map(load, names))
+
+    def evict(self, name):
+        """Drop a loaded model; in-flight users keep their reference until they finish"""
+        entry = self._entries[name]
+        with entry.lock:
+            if entry.model is None:
+                return False
+            entry.model = None
+        release_memory()
+        print(f"Model {name} evicted")
+        return True
+
+    def evict_idle(self):
+        """Evict models unused for longer than their idle timeout"""
+        now = time.monotonic()
+        return [
+            name for name, entry in list(self._entries.items())
+            if entry.model is not None and entry.idle_evict_seconds
+            and now - entry.last_used > entry.idle_evict_seconds
+            and self.evict(name)
+        ]
+
+    def stats(self):
+        now = time.monotonic()
+        return [
+            {
+                "name": entry.name,
+                "loaded": entry.model is not None,
+                "loads": entry.loads,
+                "uses": entry.uses,
+                "idle_seconds": round(now - entry.last_used, 1) if entry.last_used is not None else None,
+                "idle_evict_seconds": entry.idle_evict_seconds,
+                "load_seconds": round(entry.load_seconds, 2) if entry.load_seconds is not None else None,
+                "param_bytes": entry.param_bytes if entry.model is not None else 0,
+                "rss_delta_bytes": entry.rss_delta_bytes if entry.model is not None else 0
+            }
+            for entry in self._entries.values()
+        ]
+
+
+async def evict_idle_models(registry, interval_seconds):
+    """Periodically evict idle models for the lifetime of the app"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        registry.evict_idle()
+
+
+model_registry = ModelRegistry()
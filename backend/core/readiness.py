@@ -0,0 +1,69 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ComponentTracker:
+    """Status and load duration of the components a replica loads before serving.
+
+    A component is `pending` until its load starts, then `loading`, and ends
+    `ready` or `failed`. The replica is ready once every component finished
+    and no required one failed.
+    """
+
+    def __init__(self):
+        self.components = {}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    def expect(self, *names, required=True):
+        """Declare components before their load starts, so readiness waits for them"""
+        with self._lock:
+            for name in names:
+                self.components.setdefault(name, {
+                    "status": "pending",
+                    "required": required,
+                    "seconds": None,
+                    "error": None
+                })
+
+    @contextmanager
+    def track(self, name, required=True):
+        """Time the load of a component; an exception marks it failed and propagates.
+
+        The block may also set `component["status"] = "failed"` (and an error)
+        for a load it tolerates.
+        """
+        self.expect(name, required=required)
+        component = self.components[name]
+        component.update(status="loading", error=None)
+        started = time.perf_counter()
+        try:
+            yield component
+        except Exception as e:
+            component.update(status="failed", error=str(e))
+            raise
+        else:
+            if component["status"] == "loading":
+                component["status"] = "ready"
+        finally:
+            component["seconds"] = round(time.perf_counter() - started, 3)
+
+    def is_ready(self):
+        with self._lock:
+            components = list(self.components.values())
+        return all(c["status"] in ("ready", "failed") for c in components) and \
+            not any(c["required"] and c["status"] == "failed" for c in components)
+
+    def report(self):
+        with self._lock:
+            components = {name: dict(component) for name, component in self.components.items()}
+        return {
+            "ready": self.is_ready(),
+            "uptime_seconds": round(time.monotonic() - self._started, 1),
+            "components": components
+        }
+
+
+# Startup loads of this process, reported by /ready
+readiness = ComponentTracker()
@@ -9,37 +9,59 @@ from models.florence import ImageProcessRequest, ImageProcessResponse, TaskListR
 from utils.florence import (
     load_florence_model,
     run_florence_inference,
+    FLORENCE_CHECKPOINT,
     FLORENCE_DETAILED_CAPTION_TASK
 )
 from core.dependencies import get_current_user
+from core.executors import run_vision
+from core.model_registry import model_registry
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# Global variables for model and processor
-FLORENCE_MODEL = None
-FLORENCE_PROCESSOR = None
-DEVICE = None
+def load_florence():
+    """Load the Florence model and processor on the best available device"""
+    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    logger.info(f"Using device: {device}")
+    model, processor = load_florence_model(device=device)
+    return model, processor, device
 
-@router.on_event("startup")
-async def load_florence_models():
-    """Load Florence models on startup"""
-    global FLORENCE_MODEL, FLORENCE_PROCESSOR, DEVICE
-    
+# Loaded on first use, or at startup when listed in MODEL_WARMUP
+FLORENCE_MODEL_NAME = model_registry.register(FLORENCE_CHECKPOINT, load_florence)
+
+def get_florence():
+    """Florence model, processor and device; raises 503 if the model cannot be loaded"""
     try:
-        DEVICE = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        logger.info(f"Using device: {DEVICE}")
-        
-        FLORENCE_MODEL, FLORENCE_PROCESSOR = load_florence_model(device=DEVICE)
-        logger.info("Florence models loaded successfully")
-        
+        return model_registry.get(FLORENCE_MODEL_NAME)
     except Exception as e:
         logger.error(f"Failed to load Florence models: {str(e)}")
-        # Don't raise here to allow the app to start even if Florence models fail
-        FLORENCE_MODEL = None
-        FLORENCE_PROCESSOR = None
+        raise HTTPException(
+            status_code=503,
+            detail="Florence models not available. Please check server logs."
+        )
+
+def run_inference(image: Image.Image, task: str):
+    """Run Florence inference; called on the vision executor thread"""
+    model, processor, device = get_florence()
+    with torch.inference_mode():
+        if device.type == "cuda":
+            with torch.autocast(device_type="cuda", dtype=torch.bfloat16):
+                return run_florence_inference(
+                    model=model,
+                    processor=processor,
+                    device=device,
+                    image=image,
+                    task=task
+                )
+        return run_florence_inference(
+            model=model,
+            processor=processor,
+            device=device,
+            image=image,
+            task=task
+        )
 
 @router.post("/process-image", response_model=ImageProcessResponse)
 async def process_image(
@@ -56,13 +78,6 @@ async def process_image(
     - **text_input**: Optional text input for certain tasks
     """
     try:
-        # Check if models are loaded
-        if FLORENCE_MODEL is None or FLORENCE_PROCESSOR is None:
-            raise HTTPException(
-                status_code=503, 
-                detail="Florence models not available. Please check server logs."
-            )
-        
         # Validate file type
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(
@@ -81,45 +96,30 @@ async def process_image(
                 detail=f"Invalid image file: {str(e)}"
             )
         
-        # Run inference
+        # Run inference, loading the models on first use
         try:
-            with torch.inference_mode():
-                if DEVICE.type == "cuda":
-                    with torch.autocast(device_type="cuda", dtype=torch.bfloat16):
-                        _, result = run_florence_inference(
-                            model=FLORENCE_MODEL,
-                            processor=FLORENCE_PROCESSOR,
-                            device=DEVICE,
-                            image=image,
-                            task=task
-                        )
-                else:
-                    _, result = run_florence_inference(
-                        model=FLORENCE_MODEL,
-                        processor=FLORENCE_PROCESSOR,
-                        device=DEVICE,
-                        image=image,
-                        task=task
-                    )
-                
-                logger.info("Florence inference completed successfully")
-                
-                # Extract caption or results based on task
-                if task in [FLORENCE_DETAILED_CAPTION_TASK, '<CAPTION>', '<MORE_DETAILED_CAPTION>']:
-                    caption = result.get(task, "No caption generated")
-                    return ImageProcessResponse(
-                        caption=caption,
-                        results=result,
-                        task_used=task,
-                        success=True
-                    )
-                else:
-                    return ImageProcessResponse(
-                        results=result,
-                        task_used=task,
-                        success=True
-                    )
-                
+            _, result = await run_vision(run_inference, image, task)
+            logger.info("Florence inference completed successfully")
+            
+            # Extract caption or results based on task
+            if task in [FLORENCE_DETAILED_CAPTION_TASK, '<CAPTION>', '<MORE_DETAILED_CAPTION>']:
+                caption = result.get(task, "No caption generated")
+                return ImageProcessResponse(
+                    caption=caption,
+                    results=result,
+                    task_used=task,
+                    success=True
+                )
+            else:
+                return ImageProcessResponse(
+                    results=result,
+                    task_used=task,
+                    success=True
+                )
+            
+        except HTTPException:
+            # 503 from get_florence
+            raise
         except Exception as e:
             logger.error(f"Florence inference failed: {str(e)}")
             raise HTTPException(
@@ -138,10 +138,14 @@ async def get_model_status(current_user: dict = Depends(get_current_user)):
     """
     Check if Florence models are loaded and ready.
     """
+    florence = model_registry.peek(FLORENCE_MODEL_NAME)
+    loaded = florence is not None
+    device = florence[2] if loaded else None
     return {
-        "florence_model_loaded": FLORENCE_MODEL is not None,
-        "florence_processor_loaded": FLORENCE_PROCESSOR is not None,
-        "device": str(DEVICE) if DEVICE else "Not initialized",
+        "florence_model_loaded": loaded,
+        "florence_processor_loaded": loaded,
+        "device": str(device) if device else "Not initialized",
         "cuda_available": torch.cuda.is_available(),
-        "status": "ready" if (FLORENCE_MODEL and FLORENCE_PROCESSOR) else "not_ready"
+        # Not loaded yet (or evicted) models load on the next request
+        "status": "ready" if loaded else "not_ready"
     }
\ No newline at end of file
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""FAISS index variants selectable from configuration.
+
+Supported `index_type` values:
+    flat       exact search (IndexFlat), the reference for recall
+    flat_fp16  exact search over float16-compressed vectors
+    ivf        inverted lists over a k-means coarse quantizer
+    ivf_fp16   inverted lists with float16-compressed vectors
+    ivfpq      inverted lists with product-quantized vectors
+    hnsw       HNSW graph over full vectors
+"""
+import os
+
+import faiss
+import numpy as np
+
+from core.config import settings
+
+INDEX_TYPES = ("flat", "flat_fp16", "ivf", "ivf_fp16", "ivfpq", "hnsw")
+
+
+def index_params(**overrides):
+    """Index parameters from settings, with optional overrides"""
+    params = {
+        "nlist": settings.FAISS_IVF_NLIST,
+        "nprobe": settings.FAISS_IVF_NPROBE,
+        "pq_m": settings.FAISS_PQ_M,
+        "pq_nbits": settings.FAISS_PQ_NBITS,
+        "hnsw_m": settings.FAISS_HNSW_M,
+        "ef_construction": settings.FAISS_HNSW_EF_CONSTRUCTION,
+        "ef_search": settings.FAISS_HNSW_EF_SEARCH,
+    }
+    params.update(overrides)
+    return params
+
+
+def factory_string(index_type, dim, n_vectors, params):
+    """Translate an index type into a faiss.index_factory description"""
+    # Keep ~39 training points per centroid, as faiss recommends
+    nlist = max(1, min(params["nlist"], n_vectors // 39))
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "flat_fp16":
+        return "SQfp16"
+    if index_type == "ivf":
+        return f"IVF{nlist},Flat"
+    if index_type == "ivf_fp16":
+        return f"IVF{nlist},SQfp16"
+    if index_type == "ivfpq":
+        if dim % params["pq_m"]:
+            raise ValueError(f"FAISS_PQ_M={params['pq_m']} must divide the embedding size {dim}")
+        return f"IVF{nlist},PQ{params['pq_m']}x{params['pq_nbits']}"
+    if index_type == "hnsw":
+        return f"HNSW{params['hnsw_m']},Flat"
+    raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {INDEX_TYPES}")
+
+
+def unwrap_index(index):
+    """The index an IndexIDMap/IndexIDMap2 delegates to, or the index itself"""
+    return faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+
+
+def configure_index(index, params):
+    """Apply search-time parameters (nprobe, efSearch) to an index"""
+    inner = unwrap_index(index)
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None:
+        ivf.nprobe = params["nprobe"]
+    if isinstance(inner, faiss.IndexHNSW):
+        inner.hnsw.efSearch = params["ef_search"]
+    return index
+
+
+def build_index(embeddings, index_type=None, metric=faiss.METRIC_L2, ids=None, **overrides):
+    """Build (train and fill) an index of the configured type over `embeddings`.
+
+    With `ids`, vectors keep those stable IDs and can later be removed or
+    added one by one: IVF lists store them natively, other indexes are
+    wrapped in an IndexIDMap2.
+    """
+    index_type = index_type or settings.FAISS_INDEX_TYPE
+    params = index_params(**overrides)
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    n_vectors, dim = embeddings.shape
+
+    index = faiss.index_factory(dim, factory_string(index_type, dim, n_vectors, params), metric)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efConstruction = params["ef_construction"]
+    if not index.is_trained:
+        index.train(embeddings)
+    if ids is None:
+        index.add(embeddings)
+    else:
+        # IndexIDMap renumbers the inner index on removal, which IVF lists do not support
+        if faiss.try_extract_index_ivf(index) is None:
+            index = faiss.IndexIDMap2(index)
+        index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+    return configure_index(index, params)
+
+
+def variant_path(base_path, index_type, dim, n_vectors, **overrides):
+    """Cache file for an index variant, named after its build parameters"""
+    description = factory_string(index_type, dim, n_vectors, index_params(**overrides))
+    stem, ext = os.path.splitext(base_path)
+    return f"{stem}_{description.lower().replace(',', '_')}{ext}"
+
+
+def load_or_build_index(embeddings_path, base_path, index_type, metric, **overrides):
+    """Read a cached variant index, rebuilding it when the embeddings are newer"""
+    embeddings = np.load(embeddings_path, mmap_mode="r")
+    cache_path = variant_path(base_path, index_type, embeddings.shape[1], embeddings.shape[0], **overrides)
+    if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(embeddings_path):
+        return configure_index(faiss.read_index(cache_path), index_params(**overrides))
+
+    index = build_index(embeddings, index_type, metric, **overrides)
+    faiss.write_index(index, cache_path)
+    return index
+
+
+def index_nbytes(index):
+    """Serialized size of an index, a close proxy for its resident memory"""
+    return int(faiss.serialize_index(index).nbytes)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Offline recall/latency benchmark of the FAISS index variants.
+
+Compares every variant in hscode.ann against the exact flat index on our own
+corpus and reports recall@k, QPS, build time and index size. Run from the
+backend folder, for instance:
+
+    python -m hscode.ann_benchmark --embeddings faiss_artifacts/embeddings.npy --metric ip
+    python -m hscode.ann_benchmark --index faiss_index.bin --types flat ivf hnsw --nprobe 8 32
+
+Queries are sampled corpus vectors with a little gaussian noise unless
+--queries points to an .npy file of real query embeddings.
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from .ann import INDEX_TYPES, build_index, configure_index, index_nbytes, index_params, unwrap_index
+
+
+def load_vectors(args):
+    if args.embeddings:
+        return np.ascontiguousarray(np.load(args.embeddings), dtype="float32")
+    # reconstruct_n is unsupported on the IndexIDMap2 around the served index, read the inner one
+    index = faiss.read_index(args.index)
+    inner = unwrap_index(index)  # owned by `index`, which must stay alive meanwhile
+    ivf = faiss.try_extract_index_ivf(inner)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return inner.reconstruct_n(0, inner.ntotal)
+
+
+def sample_queries(vectors, n_queries, noise, normalize, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(n_queries, len(vectors)), replace=False)
+    queries = vectors[rows] + rng.normal(0, noise, size=(len(rows), vectors.shape[1])).astype("float32")
+    queries = np.ascontiguousarray(queries, dtype="float32")
+    if normalize:
+        faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    # -1 pads the hits an approximate index could not fill, it is no match
+    hits = sum(len((set(f[:k]) & set(t)) - {-1}) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def timed_search(index, queries, k, batch_size):
+    started = time.perf_counter()
+    results = [index.search(queries[i:i + batch_size], k)[1] for i in range(0, len(queries), batch_size)]
+    elapsed = time.perf_counter() - started
+    return np.vstack(results), elapsed
+
+
+def run(args):
+    metric = faiss.METRIC_INNER_PRODUCT if args.metric == "ip" else faiss.METRIC_L2
+    vectors = load_vectors(args)
+    if args.queries:
+        queries = np.ascontiguousarray(np.load(args.queries), dtype="float32")
+    else:
+        queries = sample_queries(vectors, args.n_queries, args.noise, normalize=args.metric == "ip")
+
+    reference = build_index(vectors, "flat", metric)
+    truth, _ = timed_search(reference, queries, args.k, args.batch_size)
+
+    rows = []
+    for index_type in args.types:
+        sweep = [("nprobe", value) for value in args.nprobe] if index_type.startswith("ivf") else \
+            [("ef_search", value) for value in args.ef_search] if index_type == "hnsw" else [(None, None)]
+
+        started = time.perf_counter()
+        index = build_index(vectors, index_type, metric)
+        build_seconds = time.perf_counter() - started
+        size = index_nbytes(index)
+
+        for param, value in sweep:
+            if param:
+                configure_index(index, index_params(**{param: value}))
+            found, elapsed = timed_search(index, queries, args.k, args.batch_size)
+            rows.append({
+                "index_type": index_type,
+                "search_param": f"{param}={value}" if param else "",
+                f"recall@{args.k}": round(recall_at_k(found, truth), 4),
+                "qps": round(len(queries) / elapsed, 1),
+                "build_s": round(build_seconds, 2),
+                "size_mb": round(size / (1024 * 1024), 2),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--embeddings", help=".npy file of corpus embeddings")
+    source.add_argument("--index", help="flat FAISS index to reconstruct corpus vectors from")
+    parser.add_argument("--queries", help=".npy file of query embeddings")
+    parser.add_argument("--metric", choices=["l2", "ip"], default="l2")
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-queries", type=int, default=1000)
+    parser.add_argument("--noise", type=float, default=0.01)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[index_params()["nprobe"]])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[index_params()["ef_search"]])
+    parser.add_argument("--json", action="store_true", help="print the rows as JSON")
+    args = parser.parse_args()
+
+    rows = run(args)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    headers = list(rows[0].keys())
+    widths = [max(len(h), *(len(str(row[h])) for row in rows)) for h in headers]
+    print("  ".join(h.ljust(w) for h, w in zip(headers, widths)))
+    for row in rows:
+        print("  ".join(str(row[h]).ljust(w) for h, w in zip(headers, widths)))
+
+
+if __name__ == "__main__":
+    main()
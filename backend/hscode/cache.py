@@ -0,0 +1,68 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+from core.config import settings
+
+
+class ResultCache:
+    """Size-bounded LRU cache of serialized responses with an optional TTL.
+
+    Keys should include the data version of whatever produced the payload so a
+    reload never serves results computed from the previous data.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl_seconds: Optional[float] = None):
+        self.max_bytes = settings.RESULT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.ttl = settings.RESULT_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, payload: bytes):
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (payload, time.monotonic())
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[0])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl
+        }
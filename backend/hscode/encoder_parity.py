@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Parity check of a quantized/ONNX encoder backend against the float model.
+
+Encodes the same queries with the `torch` backend and the candidate backend,
+then reports cosine agreement of the embeddings, top-k overlap of the FAISS
+hits they produce and the encoding speedup. Exits with status 1 when the
+candidate is below the thresholds. Run from the backend folder, for instance:
+
+    python -m hscode.encoder_parity --model all-MiniLM-L6-v2 --backend torch_int8 --index faiss_index.bin
+    python -m hscode.encoder_parity --model faiss_artifacts/sbert_paraphrase_MiniLM-L6-v2 \\
+        --backend onnx_int8 --index faiss_artifacts/faiss_index.bin --normalize --queries queries.txt
+"""
+import argparse
+import json
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from .encoding import ENCODER_BACKENDS, load_encoder
+
+SAMPLE_QUERIES = [
+    "huile d'olive vierge extra",
+    "téléphone portable",
+    "olive oil",
+    "mobile phone",
+    "pièces détachées pour ordinateurs",
+    "computer parts",
+    "chaussures de sport en cuir",
+    "leather sports shoes",
+    "tomates fraîches",
+    "fresh tomatoes",
+    "voiture électrique",
+    "electric car",
+    "médicaments contenant de la pénicilline",
+    "t-shirts en coton pour hommes",
+    "dattes deglet nour",
+    "0101",
+    "8471.30",
+]
+
+
+def timed_encode(model, queries, repeat):
+    model.encode(queries[:1], convert_to_numpy=True)
+    started = time.perf_counter()
+    for _ in range(repeat):
+        embeddings = model.encode(queries, convert_to_numpy=True)
+    return np.ascontiguousarray(embeddings, dtype="float32"), (time.perf_counter() - started) / repeat
+
+
+def cosine(a, b):
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return np.sum(a * b, axis=1)
+
+
+def topk_overlap(index, reference, candidate, k, normalize):
+    if normalize:
+        reference, candidate = reference.copy(), candidate.copy()
+        faiss.normalize_L2(reference)
+        faiss.normalize_L2(candidate)
+    _, expected = index.search(reference, k)
+    _, found = index.search(candidate, k)
+    # -1 pads the hits an approximate index could not fill, it is no match
+    return np.array([len((set(e) & set(f)) - {-1}) / k for e, f in zip(expected, found)])
+
+
+def run(args):
+    queries = SAMPLE_QUERIES
+    if args.queries:
+        with open(args.queries, "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+
+    reference_model = load_encoder(args.model, "torch")
+    candidate_model = load_encoder(args.model, args.backend)
+    reference, reference_seconds = timed_encode(reference_model, queries, args.repeat)
+    candidate, candidate_seconds = timed_encode(candidate_model, queries, args.repeat)
+
+    cosines = cosine(reference, candidate)
+    report = {
+        "backend": args.backend,
+        "queries": len(queries),
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        "speedup": round(reference_seconds / candidate_seconds, 2),
+    }
+    passed = report["cosine_min"] >= args.min_cosine
+
+    if args.index:
+        overlap = topk_overlap(faiss.read_index(args.index), reference, candidate, args.k, args.normalize)
+        report[f"top{args.k}_overlap_mean"] = round(float(overlap.mean()), 4)
+        report[f"top{args.k}_overlap_min"] = round(float(overlap.min()), 4)
+        passed = passed and report[f"top{args.k}_overlap_mean"] >= args.min_overlap
+
+    report["passed"] = passed
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", required=True, help="model name or local path")
+    parser.add_argument("--backend", choices=ENCODER_BACKENDS[1:], required=True)
+    parser.add_argument("--queries", help="text file with one query per line")
+    parser.add_argument("--index", help="FAISS index to measure top-k overlap on")
+    parser.add_argument("--normalize", action="store_true", help="L2-normalize queries before searching")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    args = parser.parse_args()
+
+    report = run(args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    sys.exit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+from sentence_transformers import SentenceTransformer
+
+from core.config import settings
+from core.executors import cpu_executor
+
+ENCODER_BACKENDS = ("torch", "torch_int8", "onnx", "onnx_int8")
+
+
+def load_encoder(model_name_or_path: str, backend: str = None) -> SentenceTransformer:
+    """Load a SentenceTransformer with the configured CPU inference backend.
+
+    torch       the float model, as before
+    torch_int8  the float model with its Linear layers dynamically quantized to int8
+    onnx        the ONNX export of the model (needs sentence-transformers[onnx])
+    onnx_int8   the int8-quantized ONNX file named by ENCODER_ONNX_INT8_FILE
+
+    Every backend keeps the `encode(...)` interface; check a non-default backend
+    against the float model with `python -m hscode.encoder_parity` first.
+    """
+    backend = backend or settings.ENCODER_BACKEND
+    if backend == "torch":
+        return SentenceTransformer(model_name_or_path)
+    if backend == "torch_int8":
+        import torch
+        model = SentenceTransformer(model_name_or_path, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if backend == "onnx":
+        return SentenceTransformer(model_name_or_path, backend="onnx")
+    if backend == "onnx_int8":
+        return SentenceTransformer(
+            model_name_or_path,
+            backend="onnx",
+            model_kwargs={"file_name": settings.ENCODER_ONNX_INT8_FILE}
+        )
+    raise ValueError(f"Unknown encoder backend '{backend}', expected one of {ENCODER_BACKENDS}")
+
+
+class EmbeddingCache:
+    """Byte-bounded LRU cache of query embeddings keyed by (model name, normalized text).
+
+    Both MiniLM models are uncased and split on whitespace, so queries that only
+    differ in case or spacing share an entry. Cached vectors are read-only.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = settings.EMBEDDING_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray) -> np.ndarray:
+        embedding = np.array(embedding, copy=True)
+        embedding.flags.writeable = False
+        if embedding.nbytes > self.max_bytes:
+            return embedding
+
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = embedding
+            self._bytes += embedding.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return embedding
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes
+        }
+
+
+def cached_encode(
+    cache: EmbeddingCache,
+    model_name: str,
+    encode_fn: Callable[[List[str]], np.ndarray],
+    texts: List[str]
+) -> np.ndarray:
+    """Encode texts, running `encode_fn` only on the ones missing from the cache"""
+    embeddings = [cache.get(model_name, text) for text in texts]
+    missing = {}
+    for text, emb in zip(texts, embeddings):
+        if emb is None:
+            missing.setdefault(cache.normalize(text), text)
+    if missing:
+        encoded = {
+            key: cache.put(model_name, text, emb)
+            for (key, text), emb in zip(missing.items(), encode_fn(list(missing.values())))
+        }
+        embeddings = [
+            encoded[cache.normalize(text)] if emb is None else emb
+            for text, emb in zip(texts, embeddings)
+        ]
+    return np.stack(embeddings)
+
+
+embedding_cache = EmbeddingCache()
+
+
+class EncodingScheduler:
+    """Collect queries from concurrent requests and encode them in batches.
+
+    Callers await `encode(text)`; a background task gathers queued texts for up
+    to `max_wait_ms` or `max_batch_size` items, runs `encode_fn` once on the
+    whole batch on the CPU executor and resolves each caller's future. When a
+    `model_name` is given, texts found in the embedding cache skip the queue.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        name: str = "encoder",
+        model_name: str = None,
+        cache: EmbeddingCache = None,
+        max_wait_ms: float = None,
+        max_batch_size: int = None,
+        max_queue_size: int = None
+    ):
+        self.encode_fn = encode_fn
+        self.name = name
+        self.model_name = model_name
+        self.cache = embedding_cache if cache is None else cache
+        self.max_wait = (settings.ENCODER_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.max_batch_size = max_batch_size or settings.ENCODER_BATCH_MAX_SIZE
+        self.max_queue_size = max_queue_size or settings.ENCODER_QUEUE_MAX_SIZE
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self._batches = 0
+        self._items = 0
+        self._max_batch = 0
+        self._total_wait = 0.0
+        self._max_wait_seen = 0.0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Encode a single text, batched with other pending requests"""
+        if self.model_name:
+            cached = self.cache.get(self.model_name, text)
+            if cached is not None:
+                return cached
+
+        self._ensure_worker()
+        future = self._loop.create_future()
+        try:
+            self._queue.put_nowait((text, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise HTTPException(status_code=503, detail=f"{self.name} queue is full, retry later")
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].done()]
+            if not batch:
+                continue
+
+            self._record(batch)
+            unique = {}
+            for text, _, _ in batch:
+                unique.setdefault(self._key(text), text)
+            try:
+                embeddings = await cpu_executor.run(self.encode_fn, list(unique.values()))
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            encoded = {}
+            for (key, text), embedding in zip(unique.items(), embeddings):
+                if self.model_name:
+                    embedding = self.cache.put(self.model_name, text, embedding)
+                encoded[key] = embedding
+            for text, future, _ in batch:
+                if not future.done():
+                    future.set_result(encoded[self._key(text)])
+
+    def close(self):
+        """Stop the background worker once nothing can enqueue any more"""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+        self._worker = None
+
+    def _key(self, text):
+        return self.cache.normalize(text) if self.model_name else text
+
+    def _record(self, batch):
+        now = time.perf_counter()
+        waits = [now - enqueued for _, _, enqueued in batch]
+        self._batches += 1
+        self._items += len(batch)
+        self._max_batch = max(self._max_batch, len(batch))
+        self._total_wait += sum(waits)
+        self._max_wait_seen = max(self._max_wait_seen, max(waits))
+
+    def stats(self):
+        """Batch-size and queue-wait metrics since startup"""
+        return {
+            "name": self.name,
+            "batches": self._batches,
+            "items": self._items,
+            "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0,
+            "max_batch_size": self._max_batch,
+            "avg_queue_wait_ms": round(self._total_wait / self._items * 1000, 3) if self._items else 0,
+            "max_queue_wait_ms": round(self._max_wait_seen * 1000, 3),
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "config": {
+                "max_wait_ms": self.max_wait * 1000,
+                "max_batch_size": self.max_batch_size,
+                "max_queue_size": self.max_queue_size
+            }
+        }
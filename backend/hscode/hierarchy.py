@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""HS nomenclature tree (chapter > heading > 6-digit > 8-digit) behind /query_hs_code/.
+
+`build_hierarchy` reads hs_code.csv in one pass, then links every 8-digit
+code to its 6-digit parent through a code -> node dict instead of scanning
+the whole tree for each of them. The result is frozen into HSHierarchy:
+the nodes in preorder as int arrays (kind, code, label, end of subtree)
+over a deduplicated string pool, saved as .npy files and memory-mapped
+back while the CSV hash is unchanged.
+
+/query_hs_code/ returns the first child subtree of a heading with every node
+carrying the request's `keyword` and `value`. Those subtrees are serialized
+once per hierarchy into fragments split where the two fields go, so a
+request only joins strings and never touches the tree.
+"""
+import csv
+import json
+import os
+
+import numpy as np
+
+from .info_table import StringPool, load_arrays, save_arrays
+from .snapshot import file_sha256
+
+CHAPTER, HEADING, SUBHEADING, LEAF = range(4)
+ARRAYS = ("kinds", "codes", "labels", "ends", "strings", "offsets", "all_codes", "all_names")
+SOURCE_FILE = "source.json"
+# Where a node's keyword/value go in a fragment; json.dumps always escapes control characters
+OVERLAY = "\x00"
+
+
+def read_hs_rows(file_path):
+    """(hs_code, name) rows of hs_code.csv, spaces removed from the codes"""
+    with open(file_path, mode='r', encoding='utf-8') as file:
+        for row in csv.DictReader(file):
+            yield row['HS Code'].strip().replace(" ", ""), row['Product Name'].strip()
+
+
+def build_hierarchy(rows):
+    """Build the tree and the {hs_code: name} table from (hs_code, name) rows.
+
+    Chapters and headings are created on first reference; a 4-digit row
+    replaces its heading, 6-digit and "...00" 8-digit rows go under their
+    heading, and the other 8-digit codes under the first 6-digit node with
+    their prefix once every row is read (dropped if there is none).
+    """
+    chapters = {}
+    all_codes = {}
+    pending_8_digit_codes = []
+
+    def chapter_headings(code):
+        return chapters.setdefault(code[:2], [None, {}])[1]
+
+    def heading_children(code):
+        return chapter_headings(code).setdefault(code[:4], [None, []])[1]
+
+    for hs_code, name in rows:
+        if len(hs_code) == 1:
+            continue
+
+        if len(hs_code) == 2:
+            chapters.setdefault(hs_code, [None, {}])[0] = name
+        elif len(hs_code) == 4:
+            chapter_headings(hs_code)[hs_code] = [name, []]
+        elif len(hs_code) == 6:
+            heading_children(hs_code).append((hs_code, name, []))
+        elif len(hs_code) == 8:
+            if hs_code.endswith("00"):
+                heading_children(hs_code).append((hs_code, name, None))
+            else:
+                pending_8_digit_codes.append((hs_code, name))
+
+        all_codes[hs_code] = name
+
+    # Link 8-digit codes with their 6-digit parents
+    subheadings = {}
+    for _, headings in chapters.values():
+        for _, children in headings.values():
+            for code, _, grandchildren in children:
+                if grandchildren is not None:
+                    subheadings.setdefault(code, grandchildren)
+    for hs_code, name in pending_8_digit_codes:
+        parent = subheadings.get(hs_code[:6])
+        if parent is not None:
+            parent.append((hs_code, name, None))
+
+    return HSHierarchy.from_tree(chapters, all_codes), all_codes
+
+
+class HSHierarchy:
+    """Read-only HS tree with the pre-serialized first child subtree of every heading"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        # Chapters and headings (a few thousand) are looked up by code
+        nodes = np.flatnonzero(np.asarray(arrays["kinds"]) <= HEADING)
+        self.nodes = dict(zip(self._strings(np.asarray(arrays["codes"])[nodes]), nodes.tolist()))
+        self.fragments = self._heading_fragments()
+
+    @classmethod
+    def from_tree(cls, chapters, all_codes):
+        pool = StringPool()
+        kinds, codes, labels, ends = [], [], [], []
+
+        def add(kind, code, label):
+            kinds.append(kind)
+            codes.append(pool.add(code))
+            labels.append(pool.add(label))
+            ends.append(0)
+            return len(kinds) - 1
+
+        for chapter, (chapter_name, headings) in chapters.items():
+            chapter_node = add(CHAPTER, chapter, chapter_name)
+            for heading, (heading_name, children) in headings.items():
+                heading_node = add(HEADING, heading, heading_name)
+                for code, label, grandchildren in children:
+                    child_node = add(LEAF if grandchildren is None else SUBHEADING, code, label)
+                    for grandchild_code, grandchild_label, _ in grandchildren or ():
+                        grandchild_node = add(LEAF, grandchild_code, grandchild_label)
+                        ends[grandchild_node] = len(kinds)
+                    ends[child_node] = len(kinds)
+                ends[heading_node] = len(kinds)
+            ends[chapter_node] = len(kinds)
+
+        all_code_strings = np.asarray([pool.add(code) for code in all_codes], dtype=np.int32)
+        all_name_strings = np.asarray([pool.add(name) for name in all_codes.values()], dtype=np.int32)
+        strings, offsets = pool.arrays()
+        return cls({
+            "kinds": np.asarray(kinds, dtype=np.int8),
+            "codes": np.asarray(codes, dtype=np.int32),
+            "labels": np.asarray(labels, dtype=np.int32),
+            "ends": np.asarray(ends, dtype=np.int32),
+            "strings": strings,
+            "offsets": offsets,
+            "all_codes": all_code_strings,
+            "all_names": all_name_strings,
+        })
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a hierarchy written by `save`"""
+        return cls(load_arrays(path, ARRAYS))
+
+    def save(self, path):
+        save_arrays(path, self.arrays)
+
+    def _strings(self, indices):
+        """Decode many pool indices at once"""
+        blob, offsets = self.arrays["strings"].tobytes(), self.arrays["offsets"].tolist()
+        return [
+            blob[offsets[i]:offsets[i + 1]].decode("utf-8") if i >= 0 else None
+            for i in np.asarray(indices).tolist()
+        ]
+
+    def _heading_fragments(self):
+        """{heading: its first child subtree as JSON, split at the keyword/value overlay points}"""
+        kinds, codes, labels, ends = (np.asarray(self.arrays[name]).tolist() for name in ("kinds", "codes", "labels", "ends"))
+        strings = [json.dumps(string, ensure_ascii=False) for string in self._strings(range(len(self.arrays["offsets"]) - 1))]
+        strings.append("null")  # index -1
+
+        def fragment(node):
+            text = f'{{"id":{strings[codes[node]]},"label":{strings[labels[node]]}'
+            if kinds[node] == SUBHEADING:
+                children = []
+                child = node + 1
+                while child < ends[node]:
+                    children.append(fragment(child))
+                    child = ends[child]
+                text += f',"children":[{",".join(children)}]'
+            return text + f',{OVERLAY}}}'
+
+        return {
+            code: tuple(fragment(node + 1).split(OVERLAY))
+            for code, node in self.nodes.items()
+            if kinds[node] == HEADING and node + 1 < ends[node]
+        }
+
+    def heading_json(self, heading, value, keyword):
+        """First child subtree of a heading as JSON, every node carrying `keyword` and `value`; None if absent"""
+        fragment = self.fragments.get(heading)
+        if fragment is None:
+            return None
+        overlay = f'"keyword":{json.dumps(keyword, ensure_ascii=False)},"value":{json.dumps(value, ensure_ascii=False)}'
+        return overlay.join(fragment)
+
+    def all_codes(self):
+        """{hs_code: name} of every row"""
+        return dict(zip(self._strings(self.arrays["all_codes"]), self._strings(self.arrays["all_names"])))
+
+
+def load_hs_data(file_path, cache_dir='hs_hierarchy'):
+    """Load the HS hierarchy and {hs_code: name} table, from `cache_dir` while hs_code.csv is unchanged."""
+    sha256 = file_sha256(file_path)
+    source_path = os.path.join(cache_dir, SOURCE_FILE)
+    if os.path.exists(source_path):
+        with open(source_path, 'r') as f:
+            if json.load(f).get('sha256') == sha256:
+                hierarchy = HSHierarchy.load(cache_dir)
+                return hierarchy, hierarchy.all_codes()
+
+    hierarchy, all_codes = build_hierarchy(read_hs_rows(file_path))
+    hierarchy.save(cache_dir)
+    with open(source_path, 'w') as f:
+        json.dump({'sha256': sha256}, f)
+    return hierarchy, all_codes
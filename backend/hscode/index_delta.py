@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""Incremental updates of an ID-mapped FAISS index, persisted as a delta log.
+
+Every indexed text gets a stable ID derived from its content, so an update
+only has to embed the entries whose ID is not indexed yet and remove the IDs
+that disappeared. The base index and its id_to_info table are written in
+full on a full build or a compaction only; each incremental update appends
+one delta (added IDs with their vectors and metadata, removed IDs) to
+`<index stem>.delta.pkl`, and loading replays the log over the base.
+"""
+import hashlib
+import os
+import pickle
+
+import faiss
+import numpy as np
+
+from .ann import build_index, unwrap_index
+
+
+def entry_id(heading, text):
+    """Stable non-negative int64 ID of an indexed text under its heading"""
+    digest = hashlib.blake2b(f"{heading or ''}\x1f{text}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") & 0x7FFFFFFFFFFFFFFF
+
+
+def has_stable_ids(index, id_to_info):
+    """Whether an index was built with entry IDs rather than positions 0..n-1"""
+    if isinstance(index, faiss.IndexIDMap):
+        return True
+    return faiss.try_extract_index_ivf(index) is not None and max(id_to_info, default=-1) >= len(id_to_info)
+
+
+def delta_path(index_file):
+    stem, _ = os.path.splitext(index_file)
+    return f"{stem}.delta.pkl"
+
+
+def load_deltas(index_file):
+    """Deltas recorded since the base index was written, oldest first"""
+    path = delta_path(index_file)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def append_delta(index_file, delta):
+    """Add a delta to the log, replacing the file atomically"""
+    path = delta_path(index_file)
+    deltas = load_deltas(index_file)
+    deltas.append(delta)
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(deltas, f)
+    os.replace(path + '.tmp', path)
+    return deltas
+
+
+def clear_deltas(index_file):
+    """Drop the log once the base index includes it"""
+    path = delta_path(index_file)
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def delta_size(deltas):
+    """Number of vectors added or removed across deltas"""
+    return sum(len(delta["added"]) + len(delta["removed"]) for delta in deltas)
+
+
+def make_delta(id_to_info, entries, encode_fn, dim):
+    """Embed the entries missing from id_to_info and list the IDs no longer in entries.
+
+    `entries` maps each ID to its (text, info) pair. A changed entry has a new
+    ID, so it shows up as one removal and one addition.
+    """
+    added = [i for i in entries if i not in id_to_info]
+    removed = [i for i in id_to_info if i not in entries]
+    if added:
+        vectors = encode_fn([entries[i][0] for i in added])
+    else:
+        vectors = np.zeros((0, dim), dtype="float32")
+    return {
+        "added": np.asarray(added, dtype="int64"),
+        "vectors": np.ascontiguousarray(vectors, dtype="float32"),
+        "info": {i: entries[i][1] for i in added},
+        "removed": np.asarray(removed, dtype="int64"),
+    }
+
+
+def faiss_ids(index):
+    """IDs stored in an IndexIDMap2"""
+    return faiss.vector_to_array(index.id_map)
+
+
+def _remove_ids(index, ids, index_type):
+    if index_type != "hnsw":
+        index.remove_ids(ids)
+        return index
+    # HNSW graphs cannot drop nodes, rebuild the graph over the vectors we keep
+    gone = set(ids.tolist())
+    kept = np.array([i for i in faiss_ids(index) if i not in gone], dtype="int64")
+    vectors = np.vstack([index.reconstruct(int(i)) for i in kept]) if len(kept) else np.zeros((0, index.d), dtype="float32")
+    return build_index(vectors, index_type, unwrap_index(index).metric_type, ids=kept)
+
+
+def apply_delta(index, id_to_info, delta, index_type):
+    """Apply one delta to the index (in place when possible) and id_to_info (an InfoTable).
+
+    Returns the updated index and a new id_to_info. Re-applying a delta is
+    harmless: removed IDs that are already gone and added IDs that are
+    already present are skipped.
+    """
+    removed = np.asarray([i for i in delta["removed"] if i in id_to_info], dtype="int64")
+    if len(removed):
+        index = _remove_ids(index, removed, index_type)
+
+    keep = np.array([i not in id_to_info for i in delta["added"]], dtype=bool)
+    if keep.any():
+        index.add_with_ids(delta["vectors"][keep], delta["added"][keep])
+
+    if len(removed) or keep.any():
+        added = {int(i): delta["info"][int(i)] for i in delta["added"][keep]}
+        id_to_info = id_to_info.updated(removed, added)
+    return index, id_to_info
+
+
+def replay_deltas(index, id_to_info, index_file, index_type):
+    """Bring a base index loaded from `index_file` and its id_to_info up to date with the delta log"""
+    for delta in load_deltas(index_file):
+        index, id_to_info = apply_delta(index, id_to_info, delta, index_type)
+    return index, id_to_info
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""Columnar, memory-mappable storage of the /query_words/ id_to_info metadata.
+
+Each FAISS id maps to a row of three int32 columns (heading, hs_code,
+description) pointing into a deduplicated string table stored as one UTF-8
+blob plus offsets. Rows are sorted by id, so a lookup is one binary search,
+and every array is a plain .npy file loaded with mmap_mode='r': workers share
+the pages and nothing is unpickled at startup. `get` builds a fresh dict per
+call, so callers can annotate results without touching shared state.
+"""
+import os
+import shutil
+
+import numpy as np
+
+FIELDS = ("heading", "hs_code", "description")
+ARRAYS = ("ids",) + FIELDS + ("strings", "offsets")
+
+
+class StringPool:
+    """Deduplicated strings packed as one UTF-8 blob plus offsets, referenced by int32 indices"""
+
+    def __init__(self):
+        self.index = {}
+
+    def add(self, value):
+        """Index of a string in the pool (-1 for None)"""
+        if value is None:
+            return -1
+        return self.index.setdefault(value, len(self.index))
+
+    def arrays(self):
+        """(strings, offsets) arrays of the pool"""
+        encoded = [value.encode("utf-8") for value in self.index]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def save_arrays(path, arrays):
+    """Write {name: array} as .npy files into a directory, replacing it only once fully written"""
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.asarray(array))
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    os.replace(tmp_path, path)
+
+
+def load_arrays(path, names):
+    """Memory-map the named arrays written by `save_arrays`"""
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in names}
+
+
+def unpack_string(strings, offsets, index):
+    """String at `index` of packed (strings, offsets) arrays, None for -1"""
+    if index < 0:
+        return None
+    return bytes(strings[offsets[index]:offsets[index + 1]]).decode("utf-8")
+
+
+class InfoTable:
+    """Read-only mapping of FAISS id -> {"heading", "hs_code", "description"}"""
+
+    def __init__(self, ids, columns, strings, offsets):
+        self.ids = ids
+        self.columns = columns
+        self.strings = strings
+        self.offsets = offsets
+
+    @classmethod
+    def from_dict(cls, id_to_info):
+        """Build a table from an {id: info} dict"""
+        ids = np.fromiter(id_to_info.keys(), dtype=np.int64, count=len(id_to_info))
+        order = np.argsort(ids, kind="stable")
+        infos = list(id_to_info.values())
+
+        pool = StringPool()
+        columns = {field: np.full(len(ids), -1, dtype=np.int32) for field in FIELDS}
+        for row, position in enumerate(order):
+            info = infos[position]
+            for field in FIELDS:
+                columns[field][row] = pool.add(info.get(field))
+
+        strings, offsets = pool.arrays()
+        return cls(ids[order], columns, strings, offsets)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a table written by `save`"""
+        arrays = load_arrays(path, ARRAYS)
+        return cls(arrays["ids"], {field: arrays[field] for field in FIELDS}, arrays["strings"], arrays["offsets"])
+
+    def save(self, path):
+        """Write the arrays to a directory, replacing it only once fully written"""
+        save_arrays(path, {"ids": self.ids, "strings": self.strings, "offsets": self.offsets, **self.columns})
+
+    def _row(self, faiss_id):
+        row = int(np.searchsorted(self.ids, faiss_id))
+        if row < len(self.ids) and self.ids[row] == faiss_id:
+            return row
+        return None
+
+    def _string(self, index):
+        return unpack_string(self.strings, self.offsets, index)
+
+    def get(self, faiss_id, default=None):
+        """A new info dict for an id, or `default`"""
+        row = self._row(faiss_id)
+        if row is None:
+            return default
+        return {field: self._string(int(self.columns[field][row])) for field in FIELDS}
+
+    def updated(self, removed_ids, added):
+        """A new table without `removed_ids` and with the `added` {id: info} rows"""
+        removed = {int(faiss_id) for faiss_id in removed_ids}
+        id_to_info = {faiss_id: self.get(faiss_id) for faiss_id in self if faiss_id not in removed}
+        id_to_info.update(added)
+        return InfoTable.from_dict(id_to_info)
+
+    def __contains__(self, faiss_id):
+        return self._row(faiss_id) is not None
+
+    def __iter__(self):
+        return iter(self.ids.tolist())
+
+    def __len__(self):
+        return len(self.ids)
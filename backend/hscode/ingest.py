@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Incremental ingestion of the classification PDFs and CSVs into headings_dict/csv_dict.
+
+`ingest_manifest.json` records, for every source file, its size, mtime and
+content hash and the file in `ingest_cache/` holding what it contributed:
+the {heading: code lines} it defines for a PDF, the {hs_code: description}
+rows for a CSV. A run re-hashes only files whose size or mtime moved,
+re-parses only files whose content changed, and merges the per-file
+contributions in source order, which gives the same dicts as processing
+every file again.
+"""
+import csv
+import json
+import os
+
+from .pdf_text import read_json, write_json, extract_pdf_pages
+from .snapshot import file_sha256
+
+MANIFEST_FORMAT = 1
+
+
+def preprocess_data_with_headings(raw_data):
+    """Preprocess the raw data and create a dictionary of headings and related H.S. codes."""
+    headings_dict = {}
+    for entry in raw_data:
+        lines = entry.split('\n')
+        current_heading = ""
+        for line in lines:
+            if any(line.startswith(f"{code}.") for code in range(1, 100)):
+                current_heading = line.strip()
+                headings_dict[current_heading] = []
+            elif current_heading:
+                headings_dict[current_heading].append(line.strip())
+    return headings_dict
+
+
+def load_csv_data(csv_paths):
+    """Load the CSV data into a dictionary for fast lookups."""
+    csv_dict = {}
+    for csv_path in csv_paths:
+        with open(csv_path, mode='r') as file:
+            reader = csv.reader(file)
+            next(reader)
+            for row in reader:
+                hs_code = row[0].strip()
+                product_name = row[1].strip()
+                csv_dict[hs_code] = product_name
+    return csv_dict
+
+
+def _source_entry(path, kind, previous, rebuild):
+    """Manifest entry of a source, hashing it only when its size or mtime moved"""
+    stat = os.stat(path)
+    entry = {'kind': kind, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if not rebuild and previous and previous['size'] == entry['size'] and previous['mtime_ns'] == entry['mtime_ns']:
+        entry['sha256'] = previous['sha256']
+    else:
+        entry['sha256'] = file_sha256(path)
+    entry['artifact'] = f"{kind}-{entry['sha256']}.json"
+    return entry
+
+
+def _read_extracts(headings_file, csv_file):
+    with open(headings_file, 'r') as f:
+        headings_dict = json.load(f)
+    with open(csv_file, 'r') as f:
+        csv_dict = json.load(f)
+    return headings_dict, csv_dict
+
+
+def ingest_sources(pdf_paths, csv_paths, headings_file='headings_dict.json', csv_file='csv_dict.json',
+                   manifest_file='ingest_manifest.json', cache_dir='ingest_cache', pdf_cache_dir='pdf_text_cache',
+                   max_workers=None, rebuild=False):
+    """Bring headings_dict/csv_dict up to date with the sources.
+
+    Returns (headings_dict, csv_dict), read back from `headings_file` and
+    `csv_file` when no source changed. `rebuild` re-hashes every source and
+    recomputes its contribution.
+    """
+    pdf_paths = [path for path in pdf_paths if path.endswith('.pdf')]
+    if not pdf_paths and not csv_paths and os.path.exists(headings_file) and os.path.exists(csv_file):
+        # Deployments shipping only the extracts
+        print("No classification sources found, using the existing extracts")
+        return _read_extracts(headings_file, csv_file)
+
+    manifest = read_json(manifest_file, {})
+    previous = manifest.get('sources', {}) if manifest.get('format') == MANIFEST_FORMAT else {}
+    sources = {}
+    for kind, paths in (('pdf', pdf_paths), ('csv', csv_paths)):
+        for path in paths:
+            sources[path] = _source_entry(path, kind, previous.get(path), rebuild)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    stale = [
+        path for path, entry in sources.items()
+        if rebuild or not os.path.exists(os.path.join(cache_dir, entry['artifact']))
+    ]
+    changed = bool(stale) or sources.keys() != previous.keys() or \
+        any(entry['sha256'] != previous[path]['sha256'] for path, entry in sources.items())
+    if not changed and os.path.exists(headings_file) and os.path.exists(csv_file):
+        return _read_extracts(headings_file, csv_file)
+
+    print(f"Ingesting {len(stale)} of {len(sources)} changed classification sources")
+    stale_pdfs = [path for path in stale if sources[path]['kind'] == 'pdf']
+    pages = extract_pdf_pages(stale_pdfs, pdf_cache_dir, max_workers) if stale_pdfs else {}
+    for path in stale:
+        entry = sources[path]
+        if entry['kind'] == 'pdf':
+            contribution = preprocess_data_with_headings(pages[path])
+        else:
+            contribution = load_csv_data([path])
+        write_json(os.path.join(cache_dir, entry['artifact']), contribution)
+
+    # Later sources override earlier ones, exactly as when parsing them all in sequence
+    headings_dict, csv_dict = {}, {}
+    for path, entry in sources.items():
+        contribution = read_json(os.path.join(cache_dir, entry['artifact']), {})
+        target = headings_dict if entry['kind'] == 'pdf' else csv_dict
+        target.update(contribution)
+        entry['entries'] = len(contribution)
+
+    with open(headings_file, 'w') as f:
+        json.dump(headings_dict, f)
+    with open(csv_file, 'w') as f:
+        json.dump(csv_dict, f)
+    # The manifest goes last: an interrupted run is redone on the next start
+    write_json(manifest_file, {'format': MANIFEST_FORMAT, 'sources': sources})
+
+    live = {entry['artifact'] for entry in sources.values()}
+    for filename in os.listdir(cache_dir):
+        if filename not in live:
+            os.remove(os.path.join(cache_dir, filename))
+    return headings_dict, csv_dict
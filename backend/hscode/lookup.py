@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Prefix lookups over the headings/CSV extracts used by /hscode/query/.
+
+`query_data` used to scan every heading, then every code line, for the first
+one starting with the query. PrefixIndex answers the same question ("the
+earliest string, in original order, that starts with this prefix") with two
+binary searches over the sorted strings and a range-minimum query over their
+original positions.
+"""
+import json
+from bisect import bisect_left
+
+import numpy as np
+
+NO_MATCH = {"error": "No matching heading or H.S. code found."}
+
+
+def prefix_successor(prefix):
+    """Smallest string greater than every string starting with `prefix` (None if unbounded)"""
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
+class PrefixIndex:
+    """Earliest string (in insertion order) starting with a prefix, in O(len(prefix) * log n)"""
+
+    def __init__(self, strings):
+        strings = list(strings)
+        order = sorted(range(len(strings)), key=strings.__getitem__)
+        self._sorted = [strings[i] for i in order]
+        # Sparse table: _levels[k][i] is the smallest original position in sorted[i:i + 2**k]
+        self._levels = [np.asarray(order, dtype=np.int64)]
+        width = 1
+        while 2 * width <= len(order):
+            previous = self._levels[-1]
+            self._levels.append(np.minimum(previous[:-width], previous[width:]))
+            width *= 2
+
+    def first(self, prefix):
+        """Original position of the earliest string starting with `prefix`, or None"""
+        lo = bisect_left(self._sorted, prefix)
+        successor = prefix_successor(prefix)
+        hi = bisect_left(self._sorted, successor, lo) if successor is not None else len(self._sorted)
+        if lo >= hi:
+            return None
+        k = (hi - lo).bit_length() - 1
+        level = self._levels[k]
+        return int(min(level[lo], level[hi - (1 << k)]))
+
+
+class CodeLookup:
+    """Heading, code line and CSV lookups of one generation of headings_dict/csv_dict"""
+
+    def __init__(self, headings_dict, csv_dict):
+        self.headings = list(headings_dict.items())
+        self.code_lines = [code for codes in headings_dict.values() for code in codes]
+        self.csv_dict = csv_dict
+        self.heading_index = PrefixIndex(heading for heading, _ in self.headings)
+        self.code_index = PrefixIndex(self.code_lines)
+
+    def find(self, query):
+        """First heading starting with the query, else first code line, else exact CSV code; None if nothing matches"""
+        position = self.heading_index.first(query)
+        if position is not None:
+            heading, codes = self.headings[position]
+            return {
+                "heading": heading,
+                "related_hs_codes": codes
+            }
+
+        position = self.code_index.first(query)
+        if position is not None:
+            description = self.code_lines[position].split(' - ', 1)[-1]
+            return {
+                "hs_code": query,
+                "description": description.strip()
+            }
+
+        if query in self.csv_dict:
+            return {
+                "hs_code": query,
+                "description": self.csv_dict[query]
+            }
+        return None
+
+    def query_data(self, query):
+        """`find` serialized the way the LLM prompts expect it"""
+        result = self.find(query)
+        return json.dumps(result if result is not None else NO_MATCH, indent=4)
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""Parallel, cached page text extraction of the classification PDFs.
+
+pdfplumber parsing is CPU-bound and by far the slowest ingestion step, so the
+PDFs are parsed in a process pool and the text of each one is cached in
+`<cache dir>/<sha256>.json`. `index.json` remembers the size, mtime and
+content hash last seen for every path: an unchanged file is served from the
+cache without being read, and a touched or renamed file is hashed and only
+parsed when its content is new.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import pdfplumber
+
+from .snapshot import file_sha256
+
+INDEX_FILE = 'index.json'
+
+
+def write_json(path, data):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def extract_pages(path, cache_dir):
+    """Hash one PDF and cache its non-empty page texts unless that content is cached already.
+
+    Runs in a worker process; returns the content hash.
+    """
+    sha256 = file_sha256(path)
+    cache_path = os.path.join(cache_dir, f'{sha256}.json')
+    if not os.path.exists(cache_path):
+        with pdfplumber.open(path) as pdf:
+            pages = [text for text in (page.extract_text() for page in pdf.pages) if text]
+        write_json(cache_path, pages)
+    return sha256
+
+
+def extract_pdf_pages(paths, cache_dir='pdf_text_cache', max_workers=None):
+    """Page texts of each PDF among `paths` as {path: pages}, parsing only new or modified files."""
+    paths = [path for path in paths if path.endswith('.pdf')]
+    os.makedirs(cache_dir, exist_ok=True)
+    index_path = os.path.join(cache_dir, INDEX_FILE)
+    previous = read_json(index_path, {})
+
+    # PDFs not asked for this time keep their cached text while they exist
+    index = {path: entry for path, entry in previous.items() if 'sha256' in entry and os.path.exists(path)}
+    stale = []
+    for path in paths:
+        stat = os.stat(path)
+        key = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+        entry = previous.get(path)
+        if entry and all(entry.get(k) == v for k, v in key.items()) and \
+                os.path.exists(os.path.join(cache_dir, f"{entry['sha256']}.json")):
+            index[path] = entry
+        else:
+            index[path] = key
+            stale.append(path)
+
+    if stale:
+        workers = min(len(stale), max_workers or os.cpu_count() or 1)
+        print(f"Extracting text from {len(stale)} of {len(paths)} PDFs with {workers} processes")
+        if workers == 1:
+            hashes = [extract_pages(path, cache_dir) for path in stale]
+        else:
+            # spawn: forking a process that already holds model and server threads is unsafe
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn')) as pool:
+                hashes = list(pool.map(extract_pages, stale, [cache_dir] * len(stale)))
+        for path, sha256 in zip(stale, hashes):
+            index[path]['sha256'] = sha256
+    write_json(index_path, index)
+
+    # Drop the texts of PDFs that are gone or changed
+    live = {f"{entry['sha256']}.json" for entry in index.values()}
+    for filename in os.listdir(cache_dir):
+        if filename.endswith('.json') and filename != INDEX_FILE and filename not in live:
+            os.remove(os.path.join(cache_dir, filename))
+
+    return {path: read_json(os.path.join(cache_dir, f"{index[path]['sha256']}.json"), []) for path in paths}
+
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import pickle
 import re
@@ -5,40 +6,57 @@ import shutil
 import os
 import time
 import csv
-from typing import List
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import List, Literal
 import faiss
-import pdfplumber
-from fastapi import APIRouter, UploadFile, HTTPException, File, Depends
+from fastapi import APIRouter, UploadFile, HTTPException, File, Depends, Request, Response
+from fastapi.responses import StreamingResponse
 from langchain_community.embeddings import HuggingFaceBgeEmbeddings
 from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
 from longtrainer.trainer import LongTrainer
-from sentence_transformers import SentenceTransformer
 from langchain_ollama import ChatOllama
 
 from models.hscode import *
 from core.config import settings
 from core.database import bots_collection
-from core.dependencies import get_current_user
-from .search import hs_search_service
+from core.dependencies import get_current_user, get_current_admin
+from core.executors import run_cpu, run_io
+from core.model_registry import model_registry
+from core.readiness import ComponentTracker, readiness
+from .search import HSCodeSearchService, hs_search_service
+from .encoding import EncodingScheduler, cached_encode, embedding_cache, load_encoder
+from .ann import build_index, configure_index, index_params
+from .lookup import CodeLookup
+from .ingest import ingest_sources
+from .hierarchy import load_hs_data
+from .info_table import InfoTable
+from .index_delta import append_delta, apply_delta, clear_deltas, delta_size, entry_id, has_stable_ids, make_delta, replay_deltas
 
 router = APIRouter()
 
 # Global variables for data and models
-headings_dict = {}
-csv_dict = {}
-index = None
-id_to_info = None
 trainer = None
 bot_id = None
-new_vector_store = None
-ensemble_retriever = None
 chat_history = []
-hierarchy = {}
-all_codes = {}
 
-# Initialize models
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+# Initialize models (loaded through the registry on first use or warmup)
+EMBEDDING_MODEL_NAME = model_registry.register('all-MiniLM-L6-v2', lambda: load_encoder('all-MiniLM-L6-v2'))
+LLM_EMBEDDING_MODEL_NAME = model_registry.register('BAAI/bge-m3', lambda: HuggingFaceBgeEmbeddings(
+    model_name="BAAI/bge-m3",
+    model_kwargs={"device": "cuda:0"},
+    encode_kwargs={"normalize_embeddings": True}
+))
+
+def encode_texts(texts):
+    return model_registry.get(EMBEDDING_MODEL_NAME).encode(texts, convert_to_numpy=True)
+
+query_encoder = EncodingScheduler(
+    encode_texts,
+    name="query_words_encoder",
+    model_name=EMBEDDING_MODEL_NAME
+)
 
 llm = ChatOllama(
     model=settings.OLLAMA_CHAT_MODEL,
@@ -56,11 +74,50 @@ json_llm = ChatOllama(
     max_tokens=2048,
 )
 
-embeddings = HuggingFaceBgeEmbeddings(
-    model_name="BAAI/bge-m3",
-    model_kwargs={"device": "cuda:0"},
-    encode_kwargs={"normalize_embeddings": True}
-)
+# Token streams run on the event loop rather than the I/O executor, so they get their own limit
+llm_streams = asyncio.Semaphore(settings.LLM_STREAM_CONCURRENCY)
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_tokens(chunks, on_complete=None):
+    """Forward an async stream of LLM chunks (messages or strings) as server-sent `token` events.
+
+    When the client disconnects, Starlette closes the event generator, which
+    closes `chunks` and with it the request to Ollama. `on_complete` gets the
+    full text of a stream that ran to its end.
+    """
+    async def events():
+        response = ""
+        async with llm_streams, aclosing(chunks):
+            try:
+                async for chunk in chunks:
+                    text = chunk if isinstance(chunk, str) else chunk.content
+                    if text:
+                        response += text
+                        yield sse_event("token", {"text": text})
+            except Exception as e:
+                yield sse_event("error", {"detail": str(e)})
+                return
+        if on_complete is not None:
+            on_complete(response)
+        yield sse_event("end", {})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+class RegistryEmbeddings(Embeddings):
+    """LangChain embeddings that resolve the registry model on each call, so it can load lazily and be evicted"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def embed_documents(self, texts):
+        return model_registry.get(self.name).embed_documents(texts)
+
+    def embed_query(self, text):
+        return model_registry.get(self.name).embed_query(text)
+
+embeddings = RegistryEmbeddings(LLM_EMBEDDING_MODEL_NAME)
 
 # Utility functions
 def list_files_with_extensions(root_folder, extensions):
@@ -73,75 +130,6 @@ def list_files_with_extensions(root_folder, extensions):
                 all_paths.append(os.path.join(dirpath, filename))
     return all_paths
 
-def extract_text_from_pdfs(paths):
-    """Extract text from all PDFs in the specified folder."""
-    data = []
-    for filename in paths:
-        if filename.endswith('.pdf'):
-            with pdfplumber.open(filename) as pdf:
-                for page in pdf.pages:
-                    text = page.extract_text()
-                    if text:
-                        data.append(text)
-    return data
-
-def preprocess_data_with_headings(raw_data):
-    """Preprocess the raw data and create a dictionary of headings and related H.S. codes."""
-    headings_dict = {}
-    for entry in raw_data:
-        lines = entry.split('\n')
-        current_heading = ""
-        for line in lines:
-            if any(line.startswith(f"{code}.") for code in range(1, 100)):
-                current_heading = line.strip()
-                headings_dict[current_heading] = []
-            elif current_heading:
-                headings_dict[current_heading].append(line.strip())
-    return headings_dict
-
-def load_csv_data(csv_paths):
-    """Load the CSV data into a dictionary for fast lookups."""
-    csv_dict = {}
-    for csv_path in csv_paths:
-        with open(csv_path, mode='r') as file:
-            reader = csv.reader(file)
-            next(reader)
-            for row in reader:
-                hs_code = row[0].strip()
-                product_name = row[1].strip()
-                csv_dict[hs_code] = product_name
-    return csv_dict
-
-def query_data(headings_dict, csv_dict, query):
-    result = {}
-    for heading, codes in headings_dict.items():
-        if heading.startswith(query):
-            result = {
-                "heading": heading,
-                "related_hs_codes": codes
-            }
-            return json.dumps(result, indent=4)
-
-    for heading, codes in headings_dict.items():
-        for code in codes:
-            if code.startswith(query):
-                description = code.split(' - ', 1)[-1]
-                result = {
-                    "hs_code": query,
-                    "description": description.strip()
-                }
-                return json.dumps(result, indent=4)
-
-    if query in csv_dict:
-        result = {
-            "hs_code": query,
-            "description": csv_dict[query]
-        }
-        return json.dumps(result, indent=4)
-
-    result = {"error": "No matching heading or H.S. code found."}
-    return json.dumps(result, indent=4)
-
 def insert_periods(query):
     results = []
     for i in range(len(query)):
@@ -149,31 +137,19 @@ def insert_periods(query):
         results.append(modified_string)
     return results
 
-def is_valid_response(response):
-    try:
-        response_json = json.loads(response)
-        if isinstance(response_json, dict) and "error" in response_json:
-            return response_json["error"] != "No matching heading or H.S. code found."
-        return True
-    except json.JSONDecodeError:
-        return True
-
 # FAISS functions
 def is_valid_hs_code(text):
     """Check if the text matches an HS code pattern."""
     return bool(re.match(r"^\d+(\.\d+)?(-\d+)?$", text.strip()))
 
-def create_faiss_index(headings_dict, csv_dict):
-    """Create a Faiss index and mapping dictionary."""
-    data = []
-    id_to_info = {}
+def faiss_entries(headings_dict, csv_dict):
+    """Texts to embed and their metadata, keyed by a stable ID."""
+    entries = {}
 
     for heading, codes in headings_dict.items():
-        data.append(heading)
-        id_to_info[len(data) - 1] = {"heading": heading, "hs_code": None, "description": ""}
+        entries[entry_id(heading, heading)] = (heading, {"heading": heading, "hs_code": None, "description": ""})
 
         for code in codes:
-            data.append(code)
             parts = code.split(" - ", 1)
             hs_code = parts[0].strip()
             description = parts[1].strip() if len(parts) > 1 else ""
@@ -181,35 +157,62 @@ def create_faiss_index(headings_dict, csv_dict):
                 description = f"{hs_code} {description}".strip()
                 hs_code = None
 
-            id_to_info[len(data) - 1] = {
+            entries[entry_id(heading, code)] = (code, {
                 "heading": heading,
                 "hs_code": hs_code,
                 "description": description,
-            }
+            })
 
     for hs_code, product_name in csv_dict.items():
         entry = f"{hs_code} - {product_name}"
-        data.append(entry)
-        id_to_info[len(data) - 1] = {
+        entries[entry_id(None, entry)] = (entry, {
             "heading": None,
             "hs_code": hs_code,
             "description": product_name,
-        }
+        })
+
+    return entries
+
+def create_faiss_index(headings_dict, csv_dict):
+    """Create a Faiss index with stable IDs and its id_to_info table."""
+    entries = faiss_entries(headings_dict, csv_dict)
+    ids = list(entries.keys())
+    id_to_info = InfoTable.from_dict({i: info for i, (_, info) in entries.items()})
+
+    embeddings_data = encode_texts([text for text, _ in entries.values()])
+    index = build_index(embeddings_data, settings.FAISS_INDEX_TYPE, faiss.METRIC_L2, ids=ids)
 
-    embeddings_data = embedding_model.encode(data, convert_to_numpy=True)
-    index = faiss.IndexFlatL2(embeddings_data.shape[1])
-    index.add(embeddings_data)
+    return index, id_to_info
+
+def update_faiss_index(index, id_to_info, headings_dict, csv_dict, index_file='faiss_index.bin', info_file='id_to_info'):
+    """Embed only new or changed entries into a copy of the index and persist the change as a delta."""
+    delta = make_delta(id_to_info, faiss_entries(headings_dict, csv_dict), encode_texts, index.d)
+    print(f"Faiss index updated: {len(delta['added'])} entries added, {len(delta['removed'])} removed")
+    if not len(delta["added"]) and not len(delta["removed"]):
+        return index, id_to_info
+
+    index, id_to_info = apply_delta(faiss.clone_index(index), id_to_info, delta, settings.FAISS_INDEX_TYPE)
+    deltas = append_delta(index_file, delta)
+    # Fold the log into a new base once replaying it costs more than rewriting the base
+    if delta_size(deltas) > settings.FAISS_DELTA_COMPACT_RATIO * max(index.ntotal, 1):
+        save_faiss_index_and_info(index, id_to_info, index_file, info_file)
+        clear_deltas(index_file)
 
     return index, id_to_info
 
-def search_with_faiss(index, id_to_info, query, top_k):
+def search_with_faiss(index, id_to_info, query, top_k, query_embedding=None):
     """Search the Faiss index and return top-k results."""
-    query_embedding = embedding_model.encode([query], convert_to_numpy=True)
+    if query_embedding is None:
+        query_embedding = cached_encode(embedding_cache, EMBEDDING_MODEL_NAME, query_encoder.encode_fn, [query])
     distances, indices = index.search(query_embedding, top_k)
 
     results = []
     for i in range(len(indices[0])):
         result_id = indices[0][i]
+        # IVF/HNSW indexes pad missing hits with -1
+        if result_id < 0:
+            continue
+        # A fresh dict per hit, the table itself is shared by concurrent requests
         result_info = id_to_info.get(result_id, {"heading": None, "hs_code": None, "description": ""})
         result_info["distance"] = float(distances[0][i])
         result_info = {k: v for k, v in result_info.items() if v is not None}
@@ -217,81 +220,304 @@ def search_with_faiss(index, id_to_info, query, top_k):
 
     return results
 
-def save_faiss_index_and_info(index, id_to_info, index_file='faiss_index.bin', info_file='id_to_info.pkl'):
+async def search_with_faiss_async(index, id_to_info, query, top_k):
+    """Search the Faiss index, batching the query encoding with concurrent requests."""
+    query_embedding = await query_encoder.encode(query)
+    return await run_cpu(search_with_faiss, index, id_to_info, query, top_k, query_embedding=query_embedding[None, :])
+
+def save_faiss_index_and_info(index, id_to_info, index_file='faiss_index.bin', info_file='id_to_info'):
     """Save the Faiss index and metadata to disk."""
     faiss.write_index(index, index_file)
-    with open(info_file, 'wb') as f:
-        pickle.dump(id_to_info, f)
+    id_to_info.save(info_file)
+
+def faiss_index_exists(index_file='faiss_index.bin', info_file='id_to_info'):
+    """Whether the index and its metadata (columnar, or a pickle from older versions) are on disk."""
+    return os.path.exists(index_file) and (os.path.exists(info_file) or os.path.exists(f'{info_file}.pkl'))
 
-def load_faiss_index_and_info(index_file='faiss_index.bin', info_file='id_to_info.pkl'):
-    """Load the Faiss index and metadata from disk."""
-    if not os.path.exists(index_file) or not os.path.exists(info_file):
+def load_faiss_index_and_info(index_file='faiss_index.bin', info_file='id_to_info'):
+    """Load the Faiss index and memory-map its metadata, converting a pickled id_to_info once."""
+    if not faiss_index_exists(index_file, info_file):
         raise FileNotFoundError("Index or metadata file not found.")
 
     index = faiss.read_index(index_file)
-    with open(info_file, 'rb') as f:
-        id_to_info = pickle.load(f)
+    if not os.path.exists(info_file):
+        with open(f'{info_file}.pkl', 'rb') as f:
+            InfoTable.from_dict(pickle.load(f)).save(info_file)
 
-    return index, id_to_info
+    return index, InfoTable.load(info_file)
 
-# Initialize data on startup
-@router.on_event("startup")
-def load_data():
-    """Load data on startup."""
-    global headings_dict, csv_dict, index, id_to_info, trainer, bot_id, new_vector_store, ensemble_retriever, hierarchy, all_codes
+class SearchGeneration:
+    """One generation of the search artifacts, never mutated once built.
+
+    Handlers take the current generation once per request through the
+    `use_generation` dependency and read every artifact from it, so a reload
+    can build the next generation in the background and swap the single
+    `current_generation` reference without mixing data from both.
+    """
+
+    def __init__(self, number=0, headings_dict=None, csv_dict=None, index=None, id_to_info=None,
+                 hierarchy=None, all_codes=None, vector_store=None, retriever=None, code_retriever=None,
+                 cn_headings=None, search_service=None):
+        self.number = number
+        self.headings_dict = headings_dict if headings_dict is not None else {}
+        self.csv_dict = csv_dict if csv_dict is not None else {}
+        # Prefix index over the headings, code lines and CSV codes
+        self.code_lookup = CodeLookup(self.headings_dict, self.csv_dict)
+        self.index = index
+        self.id_to_info = id_to_info
+        self.hierarchy = hierarchy
+        self.all_codes = all_codes if all_codes is not None else {}
+        self.vector_store = vector_store
+        self.retriever = retriever
+        # k=10 retriever of /query_hs_code/, built once per generation
+        self.code_retriever = code_retriever
+        # {page_content: CN headings} of the vector store documents
+        self.cn_headings = cn_headings if cn_headings is not None else {}
+        self.search_service = search_service if search_service is not None else hs_search_service
+        self.loaded_at = time.time()
+        self.in_flight = 0
+
+current_generation = SearchGeneration()
+startup_task = None
+reload_task = None
+reload_status = {"state": "idle", "generation": 0, "started_at": None, "finished_at": None, "drained": None, "error": None,
+                 "components": {}}
+
+async def use_generation():
+    """Pin the current search generation for the duration of a request."""
+    generation = current_generation
+    if generation.number == 0:
+        raise HTTPException(status_code=503, detail="HS code data is still loading, see /ready.")
+    generation.in_flight += 1
+    try:
+        yield generation
+    finally:
+        generation.in_flight -= 1
 
+def load_headings_and_csv(rebuild=False):
+    """Read the headings/CSV extracts, re-ingesting only the PDFs and CSVs that changed since the last run."""
     root_folder = settings.AI_CLASSIFICATION_PATH
     pdf_folder_path = list_files_with_extensions(root_folder, ["pdf"])
     csv_file_path = list_files_with_extensions(root_folder, ["csv"])
+    return ingest_sources(
+        pdf_folder_path, csv_file_path,
+        pdf_cache_dir=settings.PDF_TEXT_CACHE_PATH,
+        max_workers=settings.PDF_EXTRACT_WORKERS or None,
+        rebuild=rebuild
+    )
 
-    headings_file_path = 'headings_dict.json'
-    csv_data_file_path = 'csv_dict.json'
+def load_query_words_index(headings_dict, csv_dict, rebuild=False, previous=None):
+    """Load the /query_words/ FAISS index, bringing it in line with the extracts or creating it when missing."""
+    # Non-flat variants are cached under their own name, with their own metadata
+    suffix = '' if settings.FAISS_INDEX_TYPE == "flat" else f'_{settings.FAISS_INDEX_TYPE}'
+    index_file = f'faiss_index{suffix}.bin'
+    info_file = f'id_to_info{suffix}'
 
-    # Load or create headings and CSV data
-    if os.path.exists(headings_file_path) and os.path.exists(csv_data_file_path):
-        with open(headings_file_path, 'r') as f:
-            headings_dict = json.load(f)
-        with open(csv_data_file_path, 'r') as f:
-            csv_dict = json.load(f)
+    if not rebuild and faiss_index_exists(index_file, info_file):
+        index, id_to_info = load_faiss_index_and_info(index_file, info_file)
+        if has_stable_ids(index, id_to_info):
+            index, id_to_info = replay_deltas(index, id_to_info, index_file, settings.FAISS_INDEX_TYPE)
+            # Always diff against the extracts: this also repairs an update that failed or was interrupted
+            index, id_to_info = update_faiss_index(
+                index, id_to_info, headings_dict, csv_dict, index_file, info_file
+            )
+        else:
+            # Built before stable IDs, it cannot be diffed
+            index, id_to_info = create_faiss_index(headings_dict, csv_dict)
+            save_faiss_index_and_info(index, id_to_info, index_file, info_file)
+            clear_deltas(index_file)
+        configure_index(index, index_params())
+    elif previous is not None and has_stable_ids(previous.index, previous.id_to_info):
+        # Only embed what changed since the serving index
+        index, id_to_info = update_faiss_index(
+            previous.index, previous.id_to_info, headings_dict, csv_dict, index_file, info_file
+        )
     else:
-        raw_data = extract_text_from_pdfs(pdf_folder_path)
-        headings_dict = preprocess_data_with_headings(raw_data)
-        csv_dict = load_csv_data(csv_file_path)
+        index, id_to_info = create_faiss_index(headings_dict, csv_dict)
+        save_faiss_index_and_info(index, id_to_info, index_file, info_file)
+        clear_deltas(index_file)
+    return index, id_to_info
 
-        with open(headings_file_path, 'w') as f:
-            json.dump(headings_dict, f)
-        with open(csv_data_file_path, 'w') as f:
-            json.dump(csv_dict, f)
+def cn_headings(page_content):
+    """4-digit prefixes of the CN codes quoted on `CN_CODE:` lines of a document"""
+    cn_codes = [line.split(':')[1].strip() for line in page_content.split('\n') if 'CN_CODE:' in line]
+    return list(dict.fromkeys(code[:4] for code in cn_codes))
 
-    # Load or create FAISS index
-    index_file = 'faiss_index.bin'
-    info_file = 'id_to_info.pkl'
+def index_cn_headings(vector_store):
+    """{page_content: CN headings} of every document, so /query_hs_code/ never parses page text.
 
-    if os.path.exists(index_file) and os.path.exists(info_file):
-        index, id_to_info = load_faiss_index_and_info(index_file, info_file)
+    Kept beside the documents rather than in their metadata, which the LLM
+    prompts and /vector_search/ also see. Keyed by content because the
+    retriever returns the documents without their docstore IDs.
+    """
+    headings = {}
+    for doc_id in vector_store.index_to_docstore_id.values():
+        document = vector_store.docstore.search(doc_id)
+        if document.page_content not in headings:
+            headings[document.page_content] = cn_headings(document.page_content)
+    return headings
+
+def load_vector_store():
+    """Load the bot's LangChain vector store, its retriever, the /query_hs_code/ retriever and its CN headings."""
+    vector_store = FAISS.load_local(
+        f"faiss_index_{bot_id}", embeddings, allow_dangerous_deserialization=True
+    )
+    return (
+        vector_store,
+        vector_store.as_retriever(search_kwargs={"k": 5}),
+        vector_store.as_retriever(search_kwargs={"k": 10}),
+        index_cn_headings(vector_store),
+    )
+
+def load_search_service(previous=None):
+    """Load the advanced search service (a fresh instance per reload, the model is shared through the registry)."""
+    if previous is None:
+        search_service = hs_search_service
+        search_service.load_data_and_models()
     else:
-        index, id_to_info = create_faiss_index(headings_dict, csv_dict)
-        save_faiss_index_and_info(index, id_to_info, index_file, info_file)
+        search_service = HSCodeSearchService()
+        if not search_service.load_data_and_models() and previous.search_service.loaded:
+            raise RuntimeError("HS Code search data failed to load, keeping the current generation")
+    return search_service
 
-    # Configure trainer
-    trainer, bot_id = configure_trainer()
-    
-    # Load vector store
+def build_search_generation(number, rebuild=False, previous=None, tracker=None, before_vector_store=None):
+    """Load every search artifact into a new generation, running the independent loads concurrently.
+
+    `before_vector_store` runs first in the vector store task (startup uses it to
+    configure the trainer, which provides the bot id).
+    """
+    tracker = tracker if tracker is not None else ComponentTracker()
+    tracker.expect("headings", "query_words_index")
+    tracker.expect("vector_store", "hs_hierarchy", "search_service", required=False)
+
+    def headings_task():
+        with tracker.track("headings"):
+            return load_headings_and_csv(rebuild)
+
+    def index_task():
+        headings_dict, csv_dict = headings.result()
+        with tracker.track("query_words_index"):
+            return load_query_words_index(headings_dict, csv_dict, rebuild, previous)
+
+    def failed(component, error, kept):
+        """Mark an optional component failed; on reload it keeps the current generation's artifacts"""
+        if kept:
+            error = f"{error} (kept from generation {previous.number})"
+        component.update(status="failed", error=error)
+
+    def vector_store_task():
+        if before_vector_store is not None:
+            before_vector_store()
+        with tracker.track("vector_store", required=False) as component:
+            try:
+                return load_vector_store()
+            except Exception as e:
+                print(f"Error loading vector store: {e}")
+                kept = previous is not None and previous.vector_store is not None
+                failed(component, str(e), kept)
+                if kept:
+                    return previous.vector_store, previous.retriever, previous.code_retriever, previous.cn_headings
+                return None, None, None, {}
+
+    def hierarchy_task():
+        with tracker.track("hs_hierarchy", required=False) as component:
+            file_path = f"{settings.AI_CLASSIFICATION_PATH}/hs_code.csv"
+            try:
+                if not os.path.exists(file_path):
+                    raise FileNotFoundError(f"{file_path} not found")
+                return load_hs_data(file_path)
+            except Exception as e:
+                print(f"Error loading HS hierarchy: {e}")
+                kept = previous is not None and previous.hierarchy is not None
+                failed(component, str(e), kept)
+                if kept:
+                    return previous.hierarchy, previous.all_codes
+                return None, {}
+
+    def search_service_task():
+        with tracker.track("search_service", required=False) as component:
+            search_service = load_search_service(previous)
+            if not search_service.loaded:
+                component.update(status="failed", error="HS Code search data not loaded")
+            return search_service
+
+    with ThreadPoolExecutor(max_workers=settings.STARTUP_LOAD_WORKERS, thread_name_prefix="load") as pool:
+        # Submitted first so the index task waiting on it never holds the only free worker
+        headings = pool.submit(headings_task)
+        index_future = pool.submit(index_task)
+        vector_store_future = pool.submit(vector_store_task)
+        hierarchy_future = pool.submit(hierarchy_task)
+        search_service_future = pool.submit(search_service_task)
+
+        headings_dict, csv_dict = headings.result()
+        index, id_to_info = index_future.result()
+        vector_store, retriever, code_retriever, cn_headings_by_content = vector_store_future.result()
+        hierarchy, all_codes = hierarchy_future.result()
+        search_service = search_service_future.result()
+
+    return SearchGeneration(
+        number=number,
+        headings_dict=headings_dict,
+        csv_dict=csv_dict,
+        index=index,
+        id_to_info=id_to_info,
+        hierarchy=hierarchy,
+        all_codes=all_codes,
+        vector_store=vector_store,
+        retriever=retriever,
+        code_retriever=code_retriever,
+        cn_headings=cn_headings_by_content,
+        search_service=search_service
+    )
+
+async def reload_generation(rebuild=False):
+    """Build the next generation off the event loop, swap it in and drain the previous one."""
+    global current_generation
+
+    previous = current_generation
+    tracker = ComponentTracker()
+    reload_status.update(state="running", started_at=time.time(), finished_at=None, drained=None, error=None,
+                         components=tracker.components)
     try:
-        new_vector_store = FAISS.load_local(
-            f"faiss_index_{bot_id}", embeddings, allow_dangerous_deserialization=True
-        )
-        ensemble_retriever = new_vector_store.as_retriever(search_kwargs={"k": 5})
+        generation = await asyncio.to_thread(build_search_generation, previous.number + 1, rebuild, previous, tracker)
     except Exception as e:
-        print(f"Error loading vector store: {e}")
+        reload_status.update(state="failed", finished_at=time.time(), error=str(e))
+        return
+
+    current_generation = generation
+    reload_status.update(state="draining", generation=generation.number)
 
-    # Load HS hierarchy data
-    file_path = f"{settings.AI_CLASSIFICATION_PATH}/hs_code.csv"
-    if os.path.exists(file_path):
-        hierarchy, all_codes = load_hs_data(file_path)
+    deadline = time.monotonic() + settings.RELOAD_DRAIN_TIMEOUT_SECONDS
+    while previous.in_flight and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    drained = previous.in_flight == 0
+    if drained and previous.search_service is not generation.search_service:
+        previous.search_service.encoder.close()
+    reload_status.update(state="idle", finished_at=time.time(), drained=drained)
 
-    # Initialize HS Code search service
-    hs_search_service.load_data_and_models()
+def startup_load():
+    """Configure the trainer and build the first generation, reporting progress to /ready."""
+    global current_generation
+
+    def setup_trainer():
+        global trainer, bot_id
+        with readiness.track("trainer"):
+            trainer, bot_id = configure_trainer()
+
+    try:
+        current_generation = build_search_generation(1, tracker=readiness, before_vector_store=setup_trainer)
+        reload_status["generation"] = current_generation.number
+    except Exception as e:
+        print(f"Error loading HS code data: {e}")
+
+# Initialize data on startup, in the background so /health and /ready answer while loading
+@router.on_event("startup")
+async def load_data():
+    """Load data on startup."""
+    global startup_task
+
+    readiness.expect("trainer")
+    startup_task = asyncio.create_task(asyncio.to_thread(startup_load))
 
 def configure_trainer():
     global embeddings, llm
@@ -368,158 +594,72 @@ def configure_trainer():
     trainer.set_custom_prompt_template(bot_id=bot_id, prompt_template=prompt)
     return trainer, bot_id
 
-# Helper functions for HS hierarchy
-def load_hs_data(file_path):
-    """Load HS Code data from a CSV and build a parent-child hierarchy."""
-    hierarchy = defaultdict(lambda: {"name": None, "children": {}})
-    all_codes = {}
-    pending_8_digit_codes = []
-
-    with open(file_path, mode='r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            hs_code = row['HS Code'].strip().replace(" ", "")
-            name = row['Product Name'].strip()
-
-            if len(hs_code) == 1:
-                continue
-
-            if len(hs_code) == 2:
-                chapter = hs_code
-                hierarchy[chapter]["name"] = name
-
-            elif len(hs_code) == 4:
-                chapter = hs_code[:2]
-                if chapter not in hierarchy:
-                    hierarchy[chapter] = {"name": None, "children": {}}
-                hierarchy[chapter]["children"][hs_code] = {
-                    "name": name,
-                    "children": [],
-                    "value": hs_code,
-                    "keyword": None
-                }
-
-            elif len(hs_code) == 6:
-                chapter = hs_code[:2]
-                heading = hs_code[:4]
-                if chapter not in hierarchy:
-                    hierarchy[chapter] = {"name": None, "children": {}}
-                if heading not in hierarchy[chapter]["children"]:
-                    hierarchy[chapter]["children"][heading] = {
-                        "name": None,
-                        "children": [],
-                        "value": heading,
-                        "keyword": None
-                    }
-                hierarchy[chapter]["children"][heading]["children"].append({
-                    "id": hs_code,
-                    "label": name,
-                    "children": [],
-                    "keyword": None
-                })
-
-            elif len(hs_code) == 8:
-                if hs_code.endswith("00"):
-                    chapter = hs_code[:2]
-                    heading = hs_code[:4]
-                    if chapter not in hierarchy:
-                        hierarchy[chapter] = {"name": None, "children": {}}
-                    if heading not in hierarchy[chapter]["children"]:
-                        hierarchy[chapter]["children"][heading] = {
-                            "name": None,
-                            "children": [],
-                            "value": heading,
-                            "keyword": None
-                        }
-                    hierarchy[chapter]["children"][heading]["children"].append({
-                        "id": hs_code,
-                        "label": name,
-                        "keyword": None
-                    })
-                else:
-                    pending_8_digit_codes.append((hs_code, name))
-
-            all_codes[hs_code] = name
-
-    # Link 8-digit codes with their 6-digit parents
-    for hs_code, name in pending_8_digit_codes:
-        parent_code = hs_code[:6]
-        parent_found = False
-
-        for chapter_data in hierarchy.values():
-            for heading_data in chapter_data["children"].values():
-                for hs in heading_data["children"]:
-                    if hs["id"] == parent_code:
-                        hs["children"].append({
-                            "id": hs_code,
-                            "label": name,
-                            "keyword": None
-                        })
-                        parent_found = True
-                        break
-                if parent_found:
-                    break
-            if parent_found:
-                break
-
-    return hierarchy, all_codes
-
-# API Endpoints
-@router.post("/query/")
-async def query(query_request: QueryRequest, current_user: dict = Depends(get_current_user)):
-    user_query = query_request.query.strip()
+def lookup_query(gen, user_query):
+    """Resolve a dotted or undotted HS code query against the headings and CSV data."""
+    lookup = gen.code_lookup
     if '.' in user_query:
-        response = query_data(headings_dict, csv_dict, user_query)
-        if is_valid_response(response):
-            return json.loads(response)
+        result = lookup.find(user_query)
+        if result is not None:
+            return result
         else:
             raise HTTPException(status_code=404, detail="No valid response for the original query.")
     else:
         modified_queries = insert_periods(user_query)
         for modified_query in modified_queries:
-            response = query_data(headings_dict, csv_dict, modified_query)
-            if is_valid_response(response):
-                return json.loads(response)
+            result = lookup.find(modified_query)
+            if result is not None:
+                return result
 
-        original_response = query_data(headings_dict, csv_dict, user_query)
-        if is_valid_response(original_response):
-            return json.loads(original_response)
+        original_result = lookup.find(user_query)
+        if original_result is not None:
+            return original_result
         else:
             raise HTTPException(status_code=404, detail="No valid response for the original query.")
 
+# API Endpoints
+@router.post("/query/")
+async def query(query_request: QueryRequest, current_user: dict = Depends(get_current_user),
+                gen: SearchGeneration = Depends(use_generation)):
+    return lookup_query(gen, query_request.query.strip())
+
 @router.post("/query_words/")
-async def query_faiss(request: QueryRequestWithK, current_user: dict = Depends(get_current_user)):
+async def query_faiss(request: QueryRequestWithK, current_user: dict = Depends(get_current_user),
+                      gen: SearchGeneration = Depends(use_generation)):
     """Query the Faiss index for the top-k results."""
-    if index is None or id_to_info is None:
+    if gen.index is None or gen.id_to_info is None:
         raise HTTPException(status_code=500, detail="Faiss index not loaded.")
 
-    results = search_with_faiss(index, id_to_info, request.query, request.top_k)
+    results = await search_with_faiss_async(gen.index, gen.id_to_info, request.query, request.top_k)
     if not results:
         raise HTTPException(status_code=404, detail="No matching results found.")
     return results
 
+def collect_file_info():
+    """Count the PDFs and CSV rows under the classification folder."""
+    root_folder = settings.AI_CLASSIFICATION_PATH
+    pdf_folder_path = list_files_with_extensions(root_folder, ["pdf"])
+    csv_file_path = list_files_with_extensions(root_folder, ["csv"])
+    
+    pdf_count = len([f for f in pdf_folder_path if f.endswith('.pdf')])
+
+    row_count = 0
+    for item in csv_file_path:
+        with open(item, 'r') as f:
+            reader = csv.reader(f)
+            row_count += sum(1 for row in reader) - 1
+
+    return {
+        "pdf_count": pdf_count,
+        "csv_row_count": row_count,
+        "CSVs": csv_file_path,
+        "PDFs": pdf_folder_path
+    }
+
 @router.get("/files/info")
 async def get_file_info(current_user: dict = Depends(get_current_user)):
     """Returns the total number of PDFs in the folder and rows in the CSV."""
     try:
-        root_folder = settings.AI_CLASSIFICATION_PATH
-        pdf_folder_path = list_files_with_extensions(root_folder, ["pdf"])
-        csv_file_path = list_files_with_extensions(root_folder, ["csv"])
-        
-        pdf_count = len([f for f in pdf_folder_path if f.endswith('.pdf')])
-
-        row_count = 0
-        for item in csv_file_path:
-            with open(item, 'r') as f:
-                reader = csv.reader(f)
-                row_count += sum(1 for row in reader) - 1
-
-        return {
-            "pdf_count": pdf_count,
-            "csv_row_count": row_count,
-            "CSVs": csv_file_path,
-            "PDFs": pdf_folder_path
-        }
+        return await run_io(collect_file_info)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving file info: {str(e)}")
 
@@ -532,11 +672,11 @@ def new_chat(bot_id):
 async def new_chat_user(current_user: dict = Depends(get_current_user)):
     global bot_id, chat_history
 
-    if not bots_collection.find_one({'bot_id': bot_id}):
+    if not await run_io(bots_collection.find_one, {'bot_id': bot_id}):
         raise HTTPException(status_code=404, detail="Bot ID not found")
 
     try:
-        chat_id = new_chat(bot_id)
+        chat_id = await run_io(new_chat, bot_id)
         chat_history = []
         return {"chat_id": chat_id}
     except Exception as e:
@@ -564,8 +704,8 @@ async def update_bot(files: List[UploadFile] = File(None), current_user: dict =
         paths = [await save_uploaded_file(file, bot_id) for file in files if
                  is_allowed_file(file.filename)] if files else []
 
-        trainer.update_chatbot(paths=paths, links=[], search_query=None, bot_id=bot_id, use_unstructured=False)
-        chat_id = new_chat(bot_id)
+        await run_io(trainer.update_chatbot, paths=paths, links=[], search_query=None, bot_id=bot_id, use_unstructured=False)
+        chat_id = await run_io(new_chat, bot_id)
 
         return {"status": "Update successful"}
 
@@ -573,18 +713,19 @@ async def update_bot(files: List[UploadFile] = File(None), current_user: dict =
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/response")
-async def get_response(query_data: QueryData, current_user: dict = Depends(get_current_user)):
+async def get_response(query_data: QueryData, stream: bool = False, current_user: dict = Depends(get_current_user),
+                       gen: SearchGeneration = Depends(use_generation)):
     global bot_id
 
     chat_id = query_data.chat_id
     query = query_data.query
 
-    if not bots_collection.find_one({'bot_id': bot_id, 'chat_ids': chat_id}):
+    if not await run_io(bots_collection.find_one, {'bot_id': bot_id, 'chat_ids': chat_id}):
         raise HTTPException(status_code=404, detail="Chat ID not found or not associated with the given Bot ID")
 
     try:
         try:
-            additional_context = search_with_faiss(index, id_to_info, query, 3)
+            additional_context = await search_with_faiss_async(gen.index, gen.id_to_info, query, 3)
         except Exception as e:
             additional_context = ""
 
@@ -596,22 +737,30 @@ async def get_response(query_data: QueryData, current_user: dict = Depends(get_c
         {query}
         """
 
-        response, ref = trainer.get_response(updated_query, bot_id, chat_id)
+        if stream:
+            # aget_response lazy-loads the chat history from MongoDB synchronously, load it off the event loop first
+            ensure_chat_loaded = getattr(trainer, "_ensure_chat_loaded", None)
+            if ensure_chat_loaded is not None:
+                await run_io(ensure_chat_loaded, bot_id, chat_id)
+            return stream_tokens(trainer.aget_response(updated_query, bot_id, chat_id))
+        response, ref = await run_io(trainer.get_response, updated_query, bot_id, chat_id)
 
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/get_description/")
-async def get_response_desc(descriptionData: DescriptionData, current_user: dict = Depends(get_current_user)):
+async def get_response_desc(descriptionData: DescriptionData, stream: bool = False,
+                            current_user: dict = Depends(get_current_user),
+                            gen: SearchGeneration = Depends(use_generation)):
     global bot_id
 
     query = descriptionData.query
 
     try:
-        context = ensemble_retriever.invoke(query)
+        context = await run_cpu(gen.retriever.invoke, query)
         try:
-            additional_context = query_data(headings_dict, csv_dict, query)
+            additional_context = gen.code_lookup.query_data(query)
         except Exception as e:
             additional_context = ""
 
@@ -655,22 +804,26 @@ async def get_response_desc(descriptionData: DescriptionData, current_user: dict
         Answer:
         """
 
-        response = llm.invoke(prompt_template).content
+        if stream:
+            return stream_tokens(llm.astream(prompt_template))
+        response = (await run_io(llm.invoke, prompt_template)).content
 
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/get_court_case/")
-async def get_response_court(descriptionData: DescriptionData, current_user: dict = Depends(get_current_user)):
+async def get_response_court(descriptionData: DescriptionData, stream: bool = False,
+                             current_user: dict = Depends(get_current_user),
+                             gen: SearchGeneration = Depends(use_generation)):
     global bot_id
 
     query = descriptionData.query
 
     try:
-        context = ensemble_retriever.invoke(query)
+        context = await run_cpu(gen.retriever.invoke, query)
         try:
-            additional_context = query_data(headings_dict, csv_dict, query)
+            additional_context = gen.code_lookup.query_data(query)
         except Exception as e:
             additional_context = ""
 
@@ -707,22 +860,26 @@ async def get_response_court(descriptionData: DescriptionData, current_user: dic
         Answer:
         """
 
-        response = llm.invoke(prompt_template).content
+        if stream:
+            return stream_tokens(llm.astream(prompt_template))
+        response = (await run_io(llm.invoke, prompt_template)).content
 
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/get_response/")
-async def get_response_new(descriptionData: DescriptionData, current_user: dict = Depends(get_current_user)):
+async def get_response_new(descriptionData: DescriptionData, stream: bool = False,
+                           current_user: dict = Depends(get_current_user),
+                           gen: SearchGeneration = Depends(use_generation)):
     global bot_id, chat_history
 
     query = descriptionData.query
 
     try:
-        context = ensemble_retriever.invoke(query)
+        context = await run_cpu(gen.retriever.invoke, query)
         try:
-            additional_context = query_data(headings_dict, csv_dict, query)
+            additional_context = gen.code_lookup.query_data(query)
         except Exception as e:
             additional_context = ""
 
@@ -782,204 +939,264 @@ async def get_response_new(descriptionData: DescriptionData, current_user: dict
    Answer:
    """
 
-        response = llm.invoke(prompt_template).content
+        def remember(response):
+            chat_history.append({
+                "question:": query,
+                "answer": response
+            })
 
-        chat_history.append({
-            "question:": query,
-            "answer": response
-        })
+        if stream:
+            return stream_tokens(llm.astream(prompt_template), on_complete=remember)
+        response = (await run_io(llm.invoke, prompt_template)).content
+
+        remember(response)
 
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def search_hs_code(query, hierarchy):
-    """Search for an HS code or heading and return only the first child key without the 'name' field."""
-    query = query.strip().replace(" ", "")
-    chapter = query[:2]
-    heading = query[:4] if len(query) > 2 else None
-
-    if chapter not in hierarchy:
-        return {"error": f"Chapter '{chapter}' not found"}
-
-    def add_value_to_children(children, value):
-        """Recursively add the 'value' key to each child and its descendants."""
-        for child in children:
-            child["value"] = value
-            if "children" in child:
-                add_value_to_children(child["children"], value)
-
-    if heading and heading in hierarchy[chapter]["children"]:
-        head_data = hierarchy[chapter]["children"][heading]
-        add_value_to_children(head_data["children"], query)
-        return head_data["children"]
-
-    return {"error": "No valid heading found"}
-
-def replace_keyword_with_abc(data, query):
-    """Recursively replace all 'keyword' fields with 'abc'."""
-    for item in data:
-        if "keyword" in item:
-            item["keyword"] = query
-
-        if "children" in item and isinstance(item["children"], list):
-            replace_keyword_with_abc(item["children"], query)
-
-    return data
-
-def main_tree(query):
-    global new_vector_store, hierarchy
-
-    faiss_retriever_i = new_vector_store.as_retriever(search_kwargs={"k": 10})
-    context = faiss_retriever_i.invoke(query)
+def main_tree(gen, query):
+    context = gen.code_retriever.invoke(query)
 
     unique_first_two_chars = set()
     for item in context:
-        page_content = item.page_content
-        for line in page_content.split('\n'):
-            if 'CN_CODE:' in line:
-                cn_code = line.split(':')[1].strip()
-                unique_first_two_chars.add(cn_code[:4])
+        headings = gen.cn_headings.get(item.page_content)
+        unique_first_two_chars.update(headings if headings is not None else cn_headings(item.page_content))
 
-    unique_first_two_chars_list = list(unique_first_two_chars)
+    if gen.hierarchy is None:
+        return []
 
+    # Pre-serialized subtrees of the matched headings, with this request's value/keyword overlaid
     heading_results = []
-    for item in unique_first_two_chars_list:
-        result = search_hs_code(item, hierarchy)
-        if result != "No valid heading found" and result is not None:
-            updated_result = replace_keyword_with_abc(result, query)
-
-            if isinstance(updated_result, list) and updated_result:
-                heading_results.append(updated_result[0])
-            elif isinstance(updated_result, dict):
-                heading_results.append(updated_result)
-
-    filtered_data = [item for item in heading_results if "error" not in item]
-    return filtered_data
+    for item in unique_first_two_chars:
+        heading = item.replace(" ", "")
+        result = gen.hierarchy.heading_json(heading, heading, query)
+        if result is not None:
+            heading_results.append(result)
+    return heading_results
 
 @router.post("/query_hs_code/")
-async def query_hs_code(request: NewQueryRequest, current_user: dict = Depends(get_current_user)):
+async def query_hs_code(request: NewQueryRequest, current_user: dict = Depends(get_current_user),
+                        gen: SearchGeneration = Depends(use_generation)):
     """Query the Faiss index for the top-k results."""
-    if index is None or id_to_info is None:
+    if gen.index is None or gen.id_to_info is None:
         raise HTTPException(status_code=500, detail="Faiss index not loaded.")
 
-    result = main_tree(request.query)
+    result = await run_cpu(main_tree, gen, request.query)
 
     if not result:
         raise HTTPException(status_code=404, detail="No matching results found.")
-    return result
+    return Response(content=f"[{','.join(result)}]", media_type="application/json")
 
 @router.post("/query_llm/")
-async def query_llm(request: NewQueryRequest, current_user: dict = Depends(get_current_user)):
+async def query_llm(request: NewQueryRequest, stream: bool = False, current_user: dict = Depends(get_current_user)):
     global llm
 
     try:
-        response = llm.invoke(request.query).content
+        if stream:
+            return stream_tokens(llm.astream(request.query))
+        response = (await run_io(llm.invoke, request.query)).content
         return {"response": response}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/vector_search/")
-async def query_vectorstore(request: VectorQueryRequest, current_user: dict = Depends(get_current_user)):
-    global ensemble_retriever
-
+async def query_vectorstore(request: VectorQueryRequest, current_user: dict = Depends(get_current_user),
+                            gen: SearchGeneration = Depends(use_generation)):
     try:
-        context = ensemble_retriever.invoke(request.query)
-        results = search_with_faiss(index, id_to_info, request.query, top_k=request.top_k)
+        context = await run_cpu(gen.retriever.invoke, request.query)
+        results = await search_with_faiss_async(gen.index, gen.id_to_info, request.query, top_k=request.top_k)
 
         return {"main_index": context, "second_index": results}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def collect_dashboard_stats():
+    """Walk the classification folder and aggregate file statistics."""
+    root_folder = settings.AI_CLASSIFICATION_PATH
+    pdf_folder_path = list_files_with_extensions(root_folder, ["pdf"])
+    csv_file_path = list_files_with_extensions(root_folder, ["csv"])
+    
+    pdf_count = len(pdf_folder_path)
+    csv_count = len(csv_file_path)
+    total_files = pdf_count + csv_count
+    
+    def get_folder_size(folder):
+        total = 0
+        for entry in os.scandir(folder):
+            if entry.is_file():
+                total += entry.stat().st_size
+            elif entry.is_dir():
+                total += get_folder_size(entry.path)
+        return total
+        
+    total_size_mb = round(get_folder_size(root_folder) / (1024 * 1024), 2)
+    
+    def get_top_level_stats(path):
+        folders = []
+        files = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    size = get_folder_size(entry.path)
+                    folders.append({
+                        "name": entry.name,
+                        "size_mb": round(size / (1024 * 1024), 2),
+                        "item_count": sum(1 for _ in os.scandir(entry.path))
+                    })
+                elif entry.is_file():
+                    files.append(entry.name)
+        return folders, files
+    
+    top_folders, _ = get_top_level_stats(root_folder)
+    
+    extensions = {}
+    for file in pdf_folder_path + csv_file_path:
+        ext = os.path.splitext(file)[1].lower()
+        extensions[ext] = extensions.get(ext, 0) + 1
+    
+    recent_files = []
+    all_files = []
+    
+    for dirpath, _, filenames in os.walk(root_folder):
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            all_files.append({
+                "path": fp,
+                "mtime": os.path.getmtime(fp)
+            })
+    
+    recent_files = sorted(all_files, key=lambda x: x["mtime"], reverse=True)[:5]
+    recent_files = [{
+        "name": os.path.basename(f["path"]),
+        "modified": time.ctime(f["mtime"]),
+        "size_mb": round(os.path.getsize(f["path"]) / (1024 * 1024), 3)
+    } for f in recent_files]
+    
+    return {
+        "summary": {
+            "total_files": total_files,
+            "pdf_files": pdf_count,
+            "csv_files": csv_count,
+            "total_size_mb": total_size_mb,
+            "top_folder_count": len(top_folders),
+            "recent_files_sample": len(recent_files)
+        },
+        "file_types": {
+            "extensions": extensions,
+            "pdf_percentage": round((pdf_count / total_files * 100), 1) if total_files > 0 else 0,
+            "csv_percentage": round((csv_count / total_files * 100), 1) if total_files > 0 else 0
+        },
+        "top_folders": sorted(top_folders, key=lambda x: x["size_mb"], reverse=True)[:5],
+        "recent_activity": recent_files
+    }
+
 @router.get("/dashboard_stats/")
 async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
     """Returns optimized statistics for dashboard visualization"""
     try:
-        root_folder = settings.AI_CLASSIFICATION_PATH
-        pdf_folder_path = list_files_with_extensions(root_folder, ["pdf"])
-        csv_file_path = list_files_with_extensions(root_folder, ["csv"])
-        
-        pdf_count = len(pdf_folder_path)
-        csv_count = len(csv_file_path)
-        total_files = pdf_count + csv_count
-        
-        def get_folder_size(folder):
-            total = 0
-            for entry in os.scandir(folder):
-                if entry.is_file():
-                    total += entry.stat().st_size
-                elif entry.is_dir():
-                    total += get_folder_size(entry.path)
-            return total
-            
-        total_size_mb = round(get_folder_size(root_folder) / (1024 * 1024), 2)
-        
-        def get_top_level_stats(path):
-            folders = []
-            files = []
-            with os.scandir(path) as entries:
-                for entry in entries:
-                    if entry.is_dir():
-                        size = get_folder_size(entry.path)
-                        folders.append({
-                            "name": entry.name,
-                            "size_mb": round(size / (1024 * 1024), 2),
-                            "item_count": sum(1 for _ in os.scandir(entry.path))
-                        })
-                    elif entry.is_file():
-                        files.append(entry.name)
-            return folders, files
-        
-        top_folders, _ = get_top_level_stats(root_folder)
-        
-        extensions = {}
-        for file in pdf_folder_path + csv_file_path:
-            ext = os.path.splitext(file)[1].lower()
-            extensions[ext] = extensions.get(ext, 0) + 1
-        
-        recent_files = []
-        all_files = []
-        
-        for dirpath, _, filenames in os.walk(root_folder):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                all_files.append({
-                    "path": fp,
-                    "mtime": os.path.getmtime(fp)
-                })
-        
-        recent_files = sorted(all_files, key=lambda x: x["mtime"], reverse=True)[:5]
-        recent_files = [{
-            "name": os.path.basename(f["path"]),
-            "modified": time.ctime(f["mtime"]),
-            "size_mb": round(os.path.getsize(f["path"]) / (1024 * 1024), 3)
-        } for f in recent_files]
-        
-        return {
-            "summary": {
-                "total_files": total_files,
-                "pdf_files": pdf_count,
-                "csv_files": csv_count,
-                "total_size_mb": total_size_mb,
-                "top_folder_count": len(top_folders),
-                "recent_files_sample": len(recent_files)
-            },
-            "file_types": {
-                "extensions": extensions,
-                "pdf_percentage": round((pdf_count / total_files * 100), 1) if total_files > 0 else 0,
-                "csv_percentage": round((csv_count / total_files * 100), 1) if total_files > 0 else 0
-            },
-            "top_folders": sorted(top_folders, key=lambda x: x["size_mb"], reverse=True)[:5],
-            "recent_activity": recent_files
-        }
-        
+        return await run_io(collect_dashboard_stats)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating stats: {str(e)}")
 
 # New HS Code Search endpoint
 @router.post("/search", response_model=List[SearchResult])
-async def search_hs_codes(request: SearchRequest, current_user: dict = Depends(get_current_user)):
+async def search_hs_codes(request: SearchRequest, current_user: dict = Depends(get_current_user),
+                          gen: SearchGeneration = Depends(use_generation)):
     """Advanced HS Code search with semantic matching"""
-    return hs_search_service.search_hs_codes(request)
\ No newline at end of file
+    payload = await gen.search_service.search_hs_codes_json(request)
+    return Response(content=payload, media_type="application/json")
+
+@router.post("/search/batch", response_model=List[List[SearchResult]])
+async def search_hs_codes_batch(requests: List[SearchRequest], current_user: dict = Depends(get_current_user),
+                                gen: SearchGeneration = Depends(use_generation)):
+    """Advanced HS Code search for several line items at once, results in request order"""
+    if len(requests) > settings.SEARCH_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.SEARCH_BATCH_MAX_SIZE} queries per batch, got {len(requests)}."
+        )
+    return await run_cpu(gen.search_service.search_hs_codes_batch, requests)
+
+def next_result_json(results):
+    """Hydrate and serialize the next streamed result, None once exhausted"""
+    result = next(results, None)
+    return None if result is None else result.model_dump_json()
+
+@router.post("/search/stream")
+async def search_hs_codes_stream(request: SearchRequest, format: Literal["ndjson", "sse"] = "ndjson",
+                                 current_user: dict = Depends(get_current_user),
+                                 gen: SearchGeneration = Depends(use_generation)):
+    """Advanced HS Code search sending each parent result as soon as it is hydrated, in score order"""
+    search_service = gen.search_service
+    scores, indices = await search_service.search_hits_async(request)
+    results = search_service.iter_results(request, scores, indices)
+
+    async def stream():
+        while (payload := await run_cpu(next_result_json, results)) is not None:
+            yield f"event: result\ndata: {payload}\n\n" if format == "sse" else payload + "\n"
+        if format == "sse":
+            yield "event: end\ndata: {}\n\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@router.get("/content/{content_id}")
+async def get_content(content_id: str, request: Request, current_user: dict = Depends(get_current_user),
+                      gen: SearchGeneration = Depends(use_generation)):
+    """Document referenced by a `content: "ref"` search result, cacheable by its ETag"""
+    content = gen.search_service.get_content(content_id)
+    if content is None:
+        raise HTTPException(status_code=404, detail="Content not found.")
+
+    # The id is derived from the content hash, so a document never changes under its id
+    etag = f'"{content_id}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if_none_match = [tag.strip().removeprefix("W/") for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return Response(content=content, media_type="text/plain; charset=utf-8", headers=headers)
+
+@router.get("/encoder_stats/")
+async def get_encoder_stats(current_user: dict = Depends(get_current_user)):
+    """Batch-size, queue-wait and embedding cache metrics of query encoding"""
+    return {
+        "schedulers": [current_generation.search_service.encoder.stats(), query_encoder.stats()],
+        "embedding_cache": embedding_cache.stats()
+    }
+
+@router.get("/search/cache_stats")
+async def get_search_cache_stats(current_user: dict = Depends(get_current_user)):
+    """Hit, miss and size metrics of the /search result cache"""
+    search_service = current_generation.search_service
+    return {
+        "generation": current_generation.number,
+        "data_version": search_service.data_version,
+        "result_cache": search_service.result_cache.stats()
+    }
+
+@router.post("/admin/reload", status_code=202)
+async def trigger_reload(rebuild: bool = False, current_user: dict = Depends(get_current_admin)):
+    """Build the next search generation in the background and swap it in when ready"""
+    global reload_task
+
+    if current_generation.number == 0:
+        raise HTTPException(status_code=409, detail="Initial load has not finished")
+    if reload_status["state"] in ("running", "draining"):
+        raise HTTPException(status_code=409, detail="A reload is already in progress")
+
+    reload_status["state"] = "running"
+    reload_task = asyncio.create_task(reload_generation(rebuild))
+    return {"status": "Reload started", "generation": current_generation.number + 1, "rebuild": rebuild}
+
+@router.get("/admin/reload")
+async def get_reload_status(current_user: dict = Depends(get_current_admin)):
+    """State of the last reload and of the generation currently serving"""
+    return {
+        **reload_status,
+        "current_generation": current_generation.number,
+        "loaded_at": current_generation.loaded_at,
+        "in_flight": current_generation.in_flight
+    }
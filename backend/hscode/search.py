@@ -1,15 +1,30 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import re
 import os
+import time
 import pandas as pd
 import numpy as np
 import faiss
 from collections import defaultdict
-from sentence_transformers import SentenceTransformer
-from typing import List, Dict, Any
+from contextlib import contextmanager
+from itertools import chain
+from typing import List, Dict, Any, Iterator
 from fastapi import HTTPException
+from pydantic import TypeAdapter
 
-from models.hscode import SearchRequest, SearchResult
+from models.hscode import ContentRef, SearchRequest, SearchResult
+from core.config import settings
+from core.executors import run_cpu
+from core.model_registry import model_registry
+from .cache import ResultCache
+from .encoding import EmbeddingCache, EncodingScheduler, cached_encode, embedding_cache, load_encoder
+from .ann import load_or_build_index
+from .snapshot import SOURCES, read_snapshot, source_hashes, write_snapshot
+
+SEARCH_MODEL_NAME = 'paraphrase-MiniLM-L6-v2'
+search_results_adapter = TypeAdapter(List[SearchResult])
+HS_CODE_SEPARATORS = str.maketrans('', '', ' .')
 
 class HSCodeSearchService:
     def __init__(self):
@@ -18,86 +33,125 @@ class HSCodeSearchService:
         self.df11 = None
         self.df_propre = None
         self.combined = None
+        self.combined_codes = None
         self.df_content = None
         self.mapping = None
         self.embeddings = None
         self.index = None
-        self.model = None
+        self.code_records = {}
+        self.chapter_notes = {}
+        self.children_index = {}
+        self.content_refs = {}
+        self.contents = {}
+        self._name_lookups = []
+        self._file_lookups = []
+        self._df10_lookup = {'filename': {}, 'Description': {}}
+        self._df_propre_descriptions = {}
+        self.encoder = EncodingScheduler(
+            self.encode_queries_uncached,
+            name="hs_search_encoder",
+            model_name=SEARCH_MODEL_NAME
+        )
+        self.result_cache = ResultCache()
+        self.data_version = 0
+        self.load_timings = {}
         self.loaded = False
 
-    def load_data_and_models(self):
+    def data_paths(self):
+        """Resolve the data, snapshot and FAISS artifact paths"""
+        # Get current directory
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        
+        # Define paths based on folder structure
+        data_dir = os.path.join(base_dir, "data")
+        faiss_dir = os.path.join(base_dir, "faiss_artifacts")
+        
+        return {
+            "file1": os.path.join(data_dir, "df_Extraction_final.csv"),
+            "file10": os.path.join(data_dir, "df1_updated.csv"),
+            "file11": os.path.join(data_dir, "hs_code.csv"),
+            "content_file": os.path.join(data_dir, "df_full_content.csv"),
+            "snapshot_dir": os.path.join(data_dir, "snapshot"),
+            "embeddings": os.path.join(faiss_dir, 'embeddings.npy'),
+            "index": os.path.join(faiss_dir, 'faiss_index.bin'),
+            "model": os.path.join(faiss_dir, 'sbert_paraphrase_MiniLM-L6-v2'),
+        }
+
+    def load_data_and_models(self, use_snapshot=None):
         """Load all data and models during startup"""
+        if use_snapshot is None:
+            use_snapshot = settings.SEARCH_SNAPSHOT_ENABLED
+
         try:
-            # Get current directory
-            base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-            
-            # Define paths based on folder structure
-            data_dir = os.path.join(base_dir, "data")
-            faiss_dir = os.path.join(base_dir, "faiss_artifacts")
-            
-            # File paths
-            file1 = os.path.join(data_dir, "df_Extraction_final.csv")
-            file10 = os.path.join(data_dir, "df1_updated.csv")
-            file11 = os.path.join(data_dir, "hs_code.csv")
-            content_file = os.path.join(data_dir, "df_full_content.csv")
+            paths = self.data_paths()
             
             # Check if files exist
-            required_files = [file1, file10, file11, content_file]
+            required_files = [paths["file1"], paths["file10"], paths["file11"], paths["content_file"]]
             for file_path in required_files:
                 if not os.path.exists(file_path):
                     print(f"Warning: Required file not found: {file_path}")
                     return False
             
-            # Load datasets
-            self.df_combined = pd.read_csv(file1)
-            self.df10 = pd.read_csv(file10)
-            self.df11 = pd.read_csv(file11)
-            
-            # Preprocess data
-            self.df_propre = self.supprimer_hs_codes_anormaux(self.df_combined)
-            self.df_propre = self.detect_descriptions_suspectes(self.df_propre)
-            self.df_propre["Description"] = self.df_propre["Description"].fillna(
-                self.df_propre["Product Name"]
-            )
-            # Drop temporary column
-            if "Description_Suspecte" in self.df_propre.columns:
-                self.df_propre.drop(columns=["Description_Suspecte"], inplace=True)
-            
-            self.df11['HS Code'] = self.df11['HS Code'].str.replace(r'[ .]', '', regex=True)
-            
-            # Combine datasets
-            self.combined = pd.concat([
-                self.df_propre.assign(_source='df_propre'),
-                self.df10.assign(_source='df10'),
-                self.df11.assign(_source='df11')
-            ], ignore_index=True)
+            self.load_timings = {}
+
+            # Map the prebuilt snapshot when it was built from the current CSVs
+            snapshot = None
+            hashes = None
+            if use_snapshot:
+                with self.timed("hash_sources"):
+                    hashes = source_hashes(required_files)
+                with self.timed("read_snapshot"):
+                    try:
+                        snapshot = read_snapshot(paths["snapshot_dir"], hashes)
+                    except Exception as e:
+                        print(f"Warning: could not read search snapshot: {str(e)}")
+
+            if snapshot is not None:
+                self.combined, self.df_content, self.combined_codes, frames = snapshot
+                self.df_combined = None
+                self.df_propre, self.df10, self.df11 = (frames[source] for source in SOURCES)
+            else:
+                self.load_from_csv(paths)
+                if use_snapshot:
+                    self.write_snapshot(paths["snapshot_dir"], hashes)
             
             # Load content mapping
-            self.df_content = pd.read_csv(content_file)
-            self.mapping = dict(zip(self.df_content['filename'], self.df_content['content']))
+            with self.timed("content"):
+                self.mapping = dict(zip(self.df_content['filename'], self.df_content['content']))
+                self.chapter_notes = self.build_chapter_notes(self.df_content)
+            
+            # Precompute per-code records and the heading -> children index
+            with self.timed("lookups"):
+                self.children_index = self.build_children_index()
+                self.code_records = self.build_code_records()
             
-            # Load FAISS artifacts
-            embeddings_path = os.path.join(faiss_dir, 'embeddings.npy')
-            index_path = os.path.join(faiss_dir, 'faiss_index.bin')
-            model_path = os.path.join(faiss_dir, 'sbert_paraphrase_MiniLM-L6-v2')
+            # Deduplicated documents for content references
+            with self.timed("content_store"):
+                self.build_content_store()
             
             # Check if FAISS files exist
-            faiss_files = [embeddings_path, index_path]
+            faiss_files = [paths["embeddings"], paths["index"]]
             for file_path in faiss_files:
                 if not os.path.exists(file_path):
                     print(f"Warning: FAISS file not found: {file_path}")
                     return False
             
-            self.embeddings = np.load(embeddings_path)
-            self.index = faiss.read_index(index_path)
+            with self.timed("faiss"):
+                self.embeddings = np.load(paths["embeddings"], mmap_mode='r')
+                self.index = faiss.read_index(paths["index"])
+                if settings.SEARCH_INDEX_TYPE != "flat":
+                    # Variants are built from embeddings.npy, whose rows match the flat index ids
+                    self.index = load_or_build_index(
+                        paths["embeddings"], paths["index"], settings.SEARCH_INDEX_TYPE, self.index.metric_type
+                    )
             
-            # Load model
-            if os.path.exists(model_path):
-                self.model = SentenceTransformer(model_path)
-            else:
-                # Fallback to downloading the model
-                self.model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+            print("HS Code search data loaded: " + ", ".join(
+                f"{stage}={seconds:.2f}s" for stage, seconds in self.load_timings.items()
+            ))
             
+            # Bump the data version so cached results from the previous load are never served
+            self.data_version += 1
+            self.result_cache.clear()
             self.loaded = True
             return True
             
@@ -105,36 +159,94 @@ class HSCodeSearchService:
             print(f"Error loading HS Code search data: {str(e)}")
             return False
 
-    def supprimer_hs_codes_anormaux(self, df, hs_column="HS Code"):
-        """Remove anomalous HS codes"""
-        def is_anomalous(code):
-            if pd.isnull(code):
-                return True
-            code_str = str(code).strip()
-            if not re.fullmatch(r"\d{6,10}", code_str):
+    def load_from_csv(self, paths):
+        """Read and clean the source CSVs and build the combined table"""
+        # Load datasets
+        with self.timed("read_csv"):
+            self.df_combined = pd.read_csv(paths["file1"])
+            self.df10 = pd.read_csv(paths["file10"])
+            self.df11 = pd.read_csv(paths["file11"])
+            self.df_content = pd.read_csv(paths["content_file"])
+        
+        # Preprocess data
+        with self.timed("clean"):
+            self.df_propre = self.supprimer_hs_codes_anormaux(self.df_combined)
+            self.df_propre = self.detect_descriptions_suspectes(self.df_propre)
+            self.df_propre["Description"] = self.df_propre["Description"].fillna(
+                self.df_propre["Product Name"]
+            )
+            # Drop temporary column
+            if "Description_Suspecte" in self.df_propre.columns:
+                self.df_propre.drop(columns=["Description_Suspecte"], inplace=True)
+            
+            self.df11['HS Code'] = self.df11['HS Code'].str.translate(HS_CODE_SEPARATORS)
+        
+        # Combine datasets
+        with self.timed("combine"):
+            self.combined = pd.concat([
+                self.df_propre.assign(_source='df_propre'),
+                self.df10.assign(_source='df10'),
+                self.df11.assign(_source='df11')
+            ], ignore_index=True)
+            # Rows without a code get '', which is never a 6- or 8-digit code
+            self.combined_codes = self.combined['HS Code'].fillna('').map(str).str.strip().to_numpy()
+
+    def write_snapshot(self, snapshot_dir, hashes):
+        """Persist the cleaned tables so the next start can skip CSV parsing"""
+        with self.timed("write_snapshot"):
+            try:
+                write_snapshot(
+                    snapshot_dir, hashes, self.combined, self.df_content, self.combined_codes,
+                    columns={
+                        'df_propre': list(self.df_propre.columns),
+                        'df10': list(self.df10.columns),
+                        'df11': list(self.df11.columns),
+                    }
+                )
                 return True
-            return False
+            except Exception as e:
+                print(f"Warning: could not write search snapshot: {str(e)}")
+                return False
+
+    def build_snapshot(self):
+        """Rebuild the snapshot from the source CSVs"""
+        paths = self.data_paths()
+        required_files = [paths["file1"], paths["file10"], paths["file11"], paths["content_file"]]
+        for file_path in required_files:
+            if not os.path.exists(file_path):
+                print(f"Warning: Required file not found: {file_path}")
+                return False
+
+        self.load_from_csv(paths)
+        return self.write_snapshot(paths["snapshot_dir"], source_hashes(required_files))
 
-        df["HS_Code_Anormal"] = df[hs_column].apply(is_anomalous)
-        df_clean = df[~df["HS_Code_Anormal"]].copy()
-        df_clean.drop(columns=["HS_Code_Anormal"], inplace=True)
-        return df_clean
+    @contextmanager
+    def timed(self, stage):
+        """Record the wall time of a load stage in `load_timings`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.load_timings[stage] = time.perf_counter() - started
+
+    def supprimer_hs_codes_anormaux(self, df, hs_column="HS Code"):
+        """Remove anomalous HS codes (missing, or not 6 to 10 digits once stripped)"""
+        # Object dtype keeps Python's str/re semantics; Arrow strings make \d ASCII-only
+        codes = df[hs_column].astype(str).astype(object).str.strip()
+        valid = df[hs_column].notna() & codes.str.fullmatch(r"\d{6,10}", na=False)
+        return df[valid].copy()
 
     def detect_descriptions_suspectes(self, df, desc_column="Description"):
         """Detect suspicious descriptions"""
-        def is_invalid_description(desc):
-            if pd.isnull(desc):
-                return True
-            desc_str = str(desc).strip().lower()
-            if len(desc_str) < 5:
-                return True
-            if re.fullmatch(r"[^\w\s]+", desc_str) or re.fullmatch(r"\d+", desc_str):
-                return True
-            if desc_str in ["n/a", "na", "null", "none", "vide"]:
-                return True
-            return False
-
-        df["Description_Suspecte"] = df[desc_column].apply(is_invalid_description)
+        # Object dtype, as above: Arrow strings have ASCII-only \w/\d and their own lower()
+        desc = df[desc_column].astype(str).astype(object).str.strip().str.lower()
+        df["Description_Suspecte"] = (
+            df[desc_column].isna()
+            | (desc.str.len() < 5)
+            | desc.str.fullmatch(r"[^\w\s]+", na=False)
+            | desc.str.fullmatch(r"\d+", na=False)
+            | desc.isin(["n/a", "na", "null", "none", "vide"])
+        )
         return df
 
     def get_rubrique(self, file_name):
@@ -151,145 +263,319 @@ class HSCodeSearchService:
         else:
             return ""
 
+    @staticmethod
+    def first_by_code(df, column):
+        """Map each HS code (as str) to the first value of `column` for that code"""
+        if df is None or 'HS Code' not in df.columns or column not in df.columns:
+            return {}
+        codes = df['HS Code'].astype(str)
+        # Rows without a code match no code, as in the row-by-row lookups
+        first = df['HS Code'].notna() & ~codes.duplicated()
+        return dict(zip(codes[first], df[column][first]))
+
+    @staticmethod
+    def build_chapter_notes(df_content):
+        """Map lowercased content file names to their first content"""
+        names = df_content['filename'].str.lower()
+        first = names.notna() & ~names.duplicated()
+        return dict(zip(names[first], df_content['content'][first]))
+
+    def build_code_records(self):
+        """Resolve description, file name, rubrique and content once per HS code"""
+        self._name_lookups = [
+            self.first_by_code(df, 'Product Name')
+            for df in (self.df11, self.df10, self.df_propre)
+        ]
+        self._file_lookups = [
+            self.first_by_code(self.df11, 'File Name'),
+            self.first_by_code(self.df_propre, 'File Name'),
+            self.first_by_code(self.df10, 'filename'),
+        ]
+        self._df10_lookup = {
+            'filename': self.first_by_code(self.df10, 'filename'),
+            'Description': self.first_by_code(self.df10, 'Description'),
+        }
+        self._df_propre_descriptions = self.first_by_code(self.df_propre, 'Description')
+
+        all_codes = set()
+        for df in (self.df11, self.df10, self.df_propre):
+            if 'HS Code' in df.columns:
+                all_codes.update(df['HS Code'].dropna().astype(str).unique())
+
+        return {code: self.resolve_record(code) for code in all_codes if isinstance(code, str)}
+
+    def build_children_index(self):
+        """Map each 6-digit heading to the 8-digit codes found under it"""
+        children_index = defaultdict(set)
+        for df in (self.df11, self.df10, self.df_propre):
+            if 'HS Code' in df.columns:
+                for code in df['HS Code'].dropna().astype(str).unique():
+                    if isinstance(code, str) and len(code) == 8:
+                        children_index[code[:6]].add(code)
+        return {p6: frozenset(children) for p6, children in children_index.items()}
+
+    def resolve_record(self, code):
+        """Resolve the result fields for a code (df11 -> df10 -> df_propre priority)"""
+        fname = self.get_file(code)
+        rubrique = self.get_rubrique(fname)
+        contenu = self.mapping.get(fname, '')
+        desc = self.get_name(code)
+
+        if not rubrique and len(code) == 8:
+            if code in self._df10_lookup['filename']:
+                rubrique = "decision OMD"
+                fname = self._df10_lookup['filename'][code]
+                contenu = self._df10_lookup['Description'][code]
+        elif not rubrique and len(code) == 6:
+            if code in self._df_propre_descriptions:
+                rubrique = "note explicative"
+                desc = self._df_propre_descriptions[code]
+                contenu = desc
+
+        return {
+            'Description': desc,
+            'File Name': fname,
+            'rubrique': rubrique,
+            'contenu': contenu
+        }
+
+    def get_record(self, code):
+        """Get the precomputed record for an HS code"""
+        record = self.code_records.get(code)
+        if record is None:
+            record = self.resolve_record(code)
+        return record
+
+    @staticmethod
+    def content_ref(text):
+        """Content-addressed reference to a document"""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return ContentRef(id=digest[:32], hash=f"sha256:{digest}", length=len(text))
+
+    def build_content_store(self):
+        """Register every document a result can inline, once per distinct text"""
+        self.content_refs = {}
+        self.contents = {}
+        texts = chain(
+            self.mapping.values(),
+            self.chapter_notes.values(),
+            (record['contenu'] for record in self.code_records.values())
+        )
+        for text in texts:
+            if isinstance(text, str) and text and text not in self.content_refs:
+                ref = self.content_ref(text)
+                self.content_refs[text] = ref
+                self.contents[ref.id] = text
+
+    def get_content(self, content_id):
+        """Document text for a content reference id, or None"""
+        return self.contents.get(content_id)
+
+    def ref_for(self, contenu):
+        """Reference for an inlined document, or the value itself if it is not a stored document"""
+        if isinstance(contenu, str):
+            return self.content_refs.get(contenu, contenu)
+        return contenu
+
+    def with_content_refs(self, results: List[SearchResult]) -> List[SearchResult]:
+        """Replace every inlined document by its reference"""
+        return [
+            result.model_copy(update={
+                'contenu': self.ref_for(result.contenu),
+                'sous_codes': [
+                    {**sous_code, 'resultats': [
+                        {**resultat, 'contenu': self.ref_for(resultat['contenu'])}
+                        for resultat in sous_code['resultats']
+                    ]}
+                    for sous_code in result.sous_codes
+                ]
+            })
+            for result in results
+        ]
+
     def get_name(self, code):
         """Get product name for HS code"""
-        for df in (self.df11, self.df10, self.df_propre):
-            if 'HS Code' in df.columns and 'Product Name' in df.columns:
-                m = df[df['HS Code'].astype(str) == code]
-                if not m.empty:
-                    return m['Product Name'].iloc[0]
+        for lookup in self._name_lookups:
+            if code in lookup:
+                return lookup[code]
         return ''
 
     def get_file(self, code):
         """Get file name for HS code"""
-        for df in (self.df11, self.df_propre):
-            if 'HS Code' in df.columns and 'File Name' in df.columns:
-                m = df[df['HS Code'].astype(str) == code]
-                if not m.empty:
-                    return m['File Name'].iloc[0]
-        if 'HS Code' in self.df10.columns and 'filename' in self.df10.columns:
-            m = self.df10[self.df10['HS Code'].astype(str) == code]
-            if not m.empty:
-                return m['filename'].iloc[0]
+        for lookup in self._file_lookups:
+            if code in lookup:
+                return lookup[code]
         return "à partir de hs_codes.csv"
 
+    @property
+    def model(self):
+        """Search encoder, shared through the model registry"""
+        return model_registry.get(SEARCH_MODEL_NAME)
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode queries into L2-normalized embeddings, reusing cached ones"""
+        return cached_encode(embedding_cache, SEARCH_MODEL_NAME, self.encode_queries_uncached, queries)
+
+    def encode_queries_uncached(self, queries: List[str]) -> np.ndarray:
+        """Encode queries into L2-normalized embeddings"""
+        query_emb = self.model.encode(queries, convert_to_numpy=True)
+        faiss.normalize_L2(query_emb)
+        return query_emb
+
     def search_hs_codes(self, request: SearchRequest) -> List[SearchResult]:
         """Main search function"""
+        return self.search_hs_codes_batch([request])[0]
+
+    async def search_hs_codes_async(self, request: SearchRequest) -> List[SearchResult]:
+        """Search a single query, batching its encoding with concurrent requests"""
         if not self.loaded:
             raise HTTPException(status_code=500, detail="HS Code search service not properly loaded")
 
         try:
-            query_emb = self.model.encode([request.query], convert_to_numpy=True)
-            faiss.normalize_L2(query_emb)
-            D, I = self.index.search(query_emb, request.top_k)
-
-            parent_scores = {}
-            parents_seen = set()
-            children_map = defaultdict(set)
-
-            for score, idx in zip(D[0], I[0]):
-                row = self.combined.iloc[idx]
-                hs = str(row.get('HS Code', '')).strip()
-                if len(hs) not in (6, 8):
-                    continue
-                p6 = hs[:6]
-                parents_seen.add(p6)
-                parent_scores[p6] = max(parent_scores.get(p6, 0), float(score))
-                if len(hs) == 8:
-                    children_map[p6].add(hs)
-
-            for p6 in parents_seen:
-                for df in (self.df11, self.df10, self.df_propre):
-                    if 'HS Code' in df.columns:
-                        codes = df['HS Code'].astype(str)
-                        mask = codes.str.startswith(p6) & (codes.str.len() == 8)
-                        for child in codes[mask].unique():
-                            children_map[p6].add(child)
-
-            nested_results = []
-
-            for parent6, score in sorted(parent_scores.items(), key=lambda x: x[1], reverse=True):
-                suffix_groups = defaultdict(list)
-                for child in children_map[parent6]:
-                    suffix_groups[child[-2:]].append(child)
-
-                sous_codes = []
-                chapitre_num = parent6[:2]
-                chapitre_filename = f"Chapitre {chapitre_num}.docx"
-                match = self.df_content[self.df_content['filename'].str.lower() == chapitre_filename.lower()]
-                
-                if not match.empty:
-                    chapitre_contenu = match['content'].iloc[0]
-                    sous_codes.append({
-                        'sous_code': 'note',
-                        'resultats': [{
-                            'Description': f"Note explicative du Chapitre {chapitre_num}",
-                            'File Name': chapitre_filename,
-                            'rubrique': "note explicative",
-                            'Similarité': None,
-                            'contenu': chapitre_contenu
-                        }]
-                    })
+            query_emb = await self.encoder.encode(request.query)
+            results = await run_cpu(self.search_embeddings, [request], query_emb[np.newaxis, :])
+            return results[0]
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error during HS code search: {str(e)}")
 
-                for suffix2, codes in suffix_groups.items():
-                    resultats = []
-                    for code in codes:
-                        fname = self.get_file(code)
-                        rubrique = self.get_rubrique(fname)
-                        contenu = self.mapping.get(fname, '')
-                        desc = self.get_name(code)
-
-                        if not rubrique and len(code) == 8:
-                            match_df10 = self.df10[self.df10['HS Code'].astype(str) == code]
-                            if not match_df10.empty:
-                                rubrique = "decision OMD"
-                                fname = match_df10['filename'].iloc[0]
-                                contenu = match_df10['Description'].iloc[0]
-                        elif not rubrique and len(code) == 6:
-                            match_df_propre = self.df_propre[self.df_propre['HS Code'].astype(str) == code]
-                            if not match_df_propre.empty:
-                                rubrique = "note explicative"
-                                desc = match_df_propre['Description'].iloc[0]
-                                contenu = desc
-
-                        resultats.append({
-                            'Description': desc,
-                            'File Name': fname,
-                            'rubrique': rubrique,
-                            'Similarité': score,
-                            'contenu': contenu
-                        })
-
-                    sous_codes.append({
-                        'sous_code': suffix2,
-                        'resultats': resultats
-                    })
+    async def search_hits_async(self, request: SearchRequest):
+        """FAISS scores and row indices of a single query, encoding batched with concurrent requests"""
+        if not self.loaded:
+            raise HTTPException(status_code=500, detail="HS Code search service not properly loaded")
 
-                parent_fname = self.get_file(parent6)
-                parent_rubrique = self.get_rubrique(parent_fname)
-                parent_contenu = self.mapping.get(parent_fname, '')
-                parent_desc = self.get_name(parent6)
-
-                match_df_parent = self.df_propre[self.df_propre['HS Code'].astype(str) == parent6]
-                if not parent_rubrique and not match_df_parent.empty:
-                    parent_rubrique = "note explicative"
-                    parent_desc = match_df_parent['Description'].iloc[0]
-                    parent_contenu = parent_desc
-
-                nested_results.append(SearchResult(
-                    HS_Code=parent6,
-                    Product_Name=parent_desc,
-                    File_Name=parent_fname,
-                    rubrique=parent_rubrique,
-                    score=score,
-                    contenu=parent_contenu,
-                    sous_codes=sous_codes
-                ))
-
-            return nested_results
+        try:
+            query_emb = await self.encoder.encode(request.query)
+            D, I = await run_cpu(self.index.search, query_emb[np.newaxis, :], request.top_k)
+            return D[0], I[0]
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error during HS code search: {str(e)}")
+
+    def iter_results(self, request: SearchRequest, scores, indices) -> Iterator[SearchResult]:
+        """Yield a query's parent results one by one, with content references if requested"""
+        for result in self.iter_nested_results(scores, indices):
+            yield self.with_content_refs([result])[0] if request.content == "ref" else result
+
+    async def search_hs_codes_json(self, request: SearchRequest) -> bytes:
+        """Search a single query and return the serialized results, served from cache when possible"""
+        key = (EmbeddingCache.normalize(request.query), request.top_k, request.content, self.data_version)
+        payload = self.result_cache.get(key)
+        if payload is None:
+            results = await self.search_hs_codes_async(request)
+            payload = search_results_adapter.dump_json(results)
+            self.result_cache.put(key, payload)
+        return payload
+
+    def search_hs_codes_batch(self, requests: List[SearchRequest]) -> List[List[SearchResult]]:
+        """Search several queries with one encoder pass and one FAISS search"""
+        if not self.loaded:
+            raise HTTPException(status_code=500, detail="HS Code search service not properly loaded")
+
+        if not requests:
+            return []
+
+        try:
+            query_emb = self.encode_queries([request.query for request in requests])
+            return self.search_embeddings(requests, query_emb)
 
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error during HS code search: {str(e)}")
 
+    def search_embeddings(self, requests: List[SearchRequest], query_emb: np.ndarray) -> List[List[SearchResult]]:
+        """Run one multi-row FAISS search and build the nested results per request"""
+        D, I = self.index.search(query_emb, max(request.top_k for request in requests))
+        results = []
+        for i, request in enumerate(requests):
+            nested = self.build_nested_results(D[i][:request.top_k], I[i][:request.top_k])
+            results.append(self.with_content_refs(nested) if request.content == "ref" else nested)
+        return results
+
+    def build_nested_results(self, scores, indices) -> List[SearchResult]:
+        """Group FAISS hits by 6-digit parent and hydrate the nested results"""
+        return list(self.iter_nested_results(scores, indices))
+
+    def iter_nested_results(self, scores, indices) -> Iterator[SearchResult]:
+        """Yield the nested results one parent at a time, in score order"""
+        parent_scores = {}
+        parents_seen = set()
+        children_map = defaultdict(set)
+
+        for score, idx in zip(scores, indices):
+            # IVF/HNSW indexes pad missing hits with -1
+            if idx < 0:
+                continue
+            hs = self.combined_codes[idx]
+            if not isinstance(hs, str) or len(hs) not in (6, 8):
+                continue
+            p6 = hs[:6]
+            parents_seen.add(p6)
+            parent_scores[p6] = max(parent_scores.get(p6, 0), float(score))
+            if len(hs) == 8:
+                children_map[p6].add(hs)
+
+        for p6 in parents_seen:
+            children_map[p6].update(self.children_index.get(p6, ()))
+
+        for parent6, score in sorted(parent_scores.items(), key=lambda x: x[1], reverse=True):
+            suffix_groups = defaultdict(list)
+            for child in children_map[parent6]:
+                suffix_groups[child[-2:]].append(child)
+
+            sous_codes = []
+            chapitre_num = parent6[:2]
+            chapitre_filename = f"Chapitre {chapitre_num}.docx"
+            chapitre_contenu = self.chapter_notes.get(chapitre_filename.lower())
+
+            if chapitre_contenu is not None:
+                sous_codes.append({
+                    'sous_code': 'note',
+                    'resultats': [{
+                        'Description': f"Note explicative du Chapitre {chapitre_num}",
+                        'File Name': chapitre_filename,
+                        'rubrique': "note explicative",
+                        'Similarité': None,
+                        'contenu': chapitre_contenu
+                    }]
+                })
+
+            for suffix2, codes in suffix_groups.items():
+                resultats = []
+                for code in codes:
+                    record = self.get_record(code)
+                    resultats.append({
+                        'Description': record['Description'],
+                        'File Name': record['File Name'],
+                        'rubrique': record['rubrique'],
+                        'Similarité': score,
+                        'contenu': record['contenu']
+                    })
+
+                sous_codes.append({
+                    'sous_code': suffix2,
+                    'resultats': resultats
+                })
+
+            parent = self.get_record(parent6)
+
+            yield SearchResult(
+                HS_Code=parent6,
+                Product_Name=parent['Description'],
+                File_Name=parent['File Name'],
+                rubrique=parent['rubrique'],
+                score=score,
+                contenu=parent['contenu'],
+                sous_codes=sous_codes
+            )
+
 # Global instance
-hs_search_service = HSCodeSearchService()
\ No newline at end of file
+hs_search_service = HSCodeSearchService()
+
+def load_search_model():
+    """Local copy of the search encoder, falling back to downloading it"""
+    path = hs_search_service.data_paths()["model"]
+    return load_encoder(path if os.path.exists(path) else SEARCH_MODEL_NAME)
+
+model_registry.register(SEARCH_MODEL_NAME, load_search_model)
\ No newline at end of file
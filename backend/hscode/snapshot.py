@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Columnar snapshot of the cleaned HS code search tables.
+
+The snapshot holds the cleaned `combined` table and the content mapping as
+Parquet files, plus the stripped HS code of every combined row (the FAISS
+position alignment) as a memory-mappable .npy array. A manifest records the
+hashes of the source CSVs; a snapshot is only used while they still match.
+
+Every build writes its files under names of its own and then swaps in the
+manifest naming them, so workers sharing the directory never read a mix of
+two builds, even when they rebuild at the same time.
+
+Build it ahead of deployment with (from the backend folder):
+
+    python -m hscode.snapshot
+"""
+import hashlib
+import json
+import os
+import uuid
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FORMAT = 2
+SOURCES = ('df_propre', 'df10', 'df11')
+
+MANIFEST_FILE = 'manifest.json'
+# {file key: name pattern}, formatted with the build id
+SNAPSHOT_FILES = {
+    'combined': 'combined-{}.parquet',
+    'content': 'content-{}.parquet',
+    'codes': 'combined_codes-{}.npy',
+}
+LEGACY_FILES = {key: pattern.replace('-{}', '') for key, pattern in SNAPSHOT_FILES.items()}
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Hash a file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_hashes(paths):
+    """Map each source file name to its content hash"""
+    return {os.path.basename(path): file_sha256(path) for path in paths}
+
+
+def _to_arrow_compatible(df):
+    """Store HS codes and mixed-type object columns as strings (missing values kept)"""
+    df = df.copy()
+    # Every consumer reads HS codes through astype(str), so storing them as str is lossless
+    df['HS Code'] = df['HS Code'].astype(str)
+    for column in df.columns[df.dtypes == object]:
+        values = df[column]
+        mixed = values.notna() & ~values.map(lambda v: isinstance(v, str))
+        if mixed.any():
+            df[column] = values.where(~mixed, values[mixed].astype(str))
+    return df
+
+
+def _read_manifest(manifest_path):
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_snapshot(snapshot_dir, hashes, combined, df_content, combined_codes, columns):
+    """Write the snapshot files under a new build id, then atomically replace the manifest naming them"""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    build_id = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    files = {key: pattern.format(build_id) for key, pattern in SNAPSHOT_FILES.items()}
+
+    _to_arrow_compatible(combined).to_parquet(os.path.join(snapshot_dir, files['combined']), index=False)
+    df_content.to_parquet(os.path.join(snapshot_dir, files['content']), index=False)
+    np.save(os.path.join(snapshot_dir, files['codes']), np.asarray(combined_codes, dtype=str))
+
+    previous = _read_manifest(manifest_path)
+    tmp_path = f"{manifest_path}.{build_id}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'format': SNAPSHOT_FORMAT,
+            'sources': hashes,
+            'columns': columns,
+            'files': files,
+        }, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    # The build we replaced (fixed names before format 2); workers that mapped it keep their open files
+    if previous:
+        for name in previous.get('files', LEGACY_FILES).values():
+            if name not in files.values():
+                try:
+                    os.remove(os.path.join(snapshot_dir, name))
+                except OSError:
+                    pass
+
+
+def read_snapshot(snapshot_dir, hashes):
+    """Load a snapshot built from the given sources, or None if missing or stale.
+
+    Returns (combined, df_content, combined_codes, frames) where frames maps each
+    source name to its cleaned DataFrame.
+    """
+    manifest = _read_manifest(os.path.join(snapshot_dir, MANIFEST_FILE))
+    if manifest is None or manifest.get('format') != SNAPSHOT_FORMAT or manifest.get('sources') != hashes:
+        return None
+
+    files = {key: os.path.join(snapshot_dir, name) for key, name in manifest['files'].items()}
+    combined = pd.read_parquet(files['combined'], memory_map=True)
+    df_content = pd.read_parquet(files['content'], memory_map=True)
+    combined_codes = np.load(files['codes'], mmap_mode='r')
+
+    frames = {
+        source: combined.loc[combined['_source'] == source, manifest['columns'][source]]
+        for source in SOURCES
+    }
+    return combined, df_content, combined_codes, frames
+
+
+if __name__ == '__main__':
+    from .search import HSCodeSearchService
+
+    service = HSCodeSearchService()
+    if service.build_snapshot():
+        print("Search snapshot written.")
+    else:
+        print("Search snapshot could not be built, see warnings above.")
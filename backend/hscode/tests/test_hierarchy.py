@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from hscode.hierarchy import load_hs_data
+
+HS_CODE_CSV = '''HS Code,Product Name
+01,Live animals
+0101,"Horses, asses"
+0101 21,Pure-bred
+0101 21 10,"Breeding ""A"" stock"
+0101 29,Other
+0101 21 20,Ânes
+0101 30 00,Asses
+0102,Bovine
+0102 21 90,Orphan
+1,Skipped
+'''
+
+# First child subtree of heading 0101, byte for byte as the dict-based tree serialized it
+HEADING_0101 = (
+    '{"id":"010121","label":"Pure-bred","children":['
+    '{"id":"01012110","label":"Breeding \\"A\\" stock","keyword":"cheval","value":"0101"},'
+    '{"id":"01012120","label":"Ânes","keyword":"cheval","value":"0101"}],'
+    '"keyword":"cheval","value":"0101"}'
+)
+
+
+def write_csv(tmp_path, text=HS_CODE_CSV):
+    path = tmp_path / "hs_code.csv"
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_heading_json_matches_the_serialized_tree(tmp_path):
+    hierarchy, all_codes = load_hs_data(write_csv(tmp_path), str(tmp_path / "cache"))
+
+    assert hierarchy.heading_json("0101", "0101", "cheval") == HEADING_0101
+    # 0102 only has an 8-digit code without its 6-digit parent, which is dropped
+    assert hierarchy.heading_json("0102", "0102", "cheval") is None
+    assert hierarchy.heading_json("9999", "9999", "cheval") is None
+    assert all_codes["01012120"] == "Ânes"
+    assert "1" not in all_codes
+
+
+def test_cached_hierarchy_matches_a_fresh_build(tmp_path):
+    csv_path = write_csv(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    built, built_codes = load_hs_data(csv_path, cache_dir)
+    cached, cached_codes = load_hs_data(csv_path, cache_dir)
+
+    assert cached.fragments == built.fragments
+    assert cached_codes == built_codes
+
+    write_csv(tmp_path, HS_CODE_CSV + "0102 21,Cattle\n")
+    rebuilt, _ = load_hs_data(csv_path, cache_dir)
+    assert rebuilt.heading_json("0102", "0102", "x") == \
+        '{"id":"010221","label":"Cattle","children":[' \
+        '{"id":"01022190","label":"Orphan","keyword":"x","value":"0102"}],"keyword":"x","value":"0102"}'
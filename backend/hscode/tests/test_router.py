@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import faiss
+import numpy as np
+import pytest
+
+pytest.importorskip("sentence_transformers")
+pytest.importorskip("langchain_community")
+pytest.importorskip("longtrainer")
+
+from hscode import router  # noqa: E402
+from hscode.ann import build_index  # noqa: E402
+from hscode.info_table import InfoTable  # noqa: E402
+
+
+@pytest.mark.parametrize("index_type", ["ivf", "hnsw"])
+def test_search_with_faiss_skips_unfilled_slots(index_type):
+    rng = np.random.default_rng(0)
+    vectors = rng.random((200, 8), dtype="float32")
+    ids = np.arange(200) + 1000
+    index = build_index(vectors, index_type, faiss.METRIC_L2, ids=ids, nlist=4, nprobe=1, ef_search=16)
+    id_to_info = InfoTable.from_dict({
+        int(i): {"heading": "84.71", "hs_code": str(i), "description": f"entry {i}"} for i in ids
+    })
+
+    _, indices = index.search(vectors[:1], 150)
+    assert (indices[0] < 0).any()
+
+    results = router.search_with_faiss(index, id_to_info, "laptop", 150, query_embedding=vectors[:1])
+
+    assert len(results) == (indices[0] >= 0).sum()
+    assert all(result["description"].startswith("entry ") for result in results)
+
+
+class SearchService:
+    loaded = True
+
+    class encoder:
+        @staticmethod
+        def close():
+            pass
+
+
+@pytest.fixture
+def loaders(monkeypatch, tmp_path):
+    """Replace the artifact loaders; each test breaks the ones it needs"""
+    (tmp_path / "hs_code.csv").write_text("HS Code,Product Name\n")
+    monkeypatch.setattr(router.settings, "AI_CLASSIFICATION_PATH", str(tmp_path))
+    monkeypatch.setattr(router, "load_headings_and_csv", lambda rebuild: ({}, {}))
+    monkeypatch.setattr(router, "load_query_words_index", lambda *args: ("index", "id_to_info"))
+    monkeypatch.setattr(router, "load_search_service", lambda previous=None: SearchService())
+    monkeypatch.setattr(router, "load_vector_store", lambda: ("store", "retriever", "code_retriever", {"text": ["8471"]}))
+    monkeypatch.setattr(router, "load_hs_data", lambda path: ("hierarchy", {"8471": "Computers"}))
+    monkeypatch.setattr(router, "current_generation", router.build_search_generation(1))
+    return tmp_path
+
+
+def fail(*args):
+    raise RuntimeError("unavailable")
+
+
+def reload():
+    asyncio.run(router.reload_generation())
+    return router.current_generation, router.reload_status["components"]
+
+
+@pytest.mark.parametrize("break_hierarchy", ["missing_file", "load_error"])
+def test_reload_keeps_hierarchy_when_its_load_fails(loaders, monkeypatch, break_hierarchy):
+    if break_hierarchy == "missing_file":
+        (loaders / "hs_code.csv").unlink()
+    else:
+        monkeypatch.setattr(router, "load_hs_data", fail)
+
+    generation, components = reload()
+
+    assert generation.number == 2
+    assert generation.hierarchy == "hierarchy"
+    assert generation.all_codes == {"8471": "Computers"}
+    assert components["hs_hierarchy"]["status"] == "failed"
+    assert "kept from generation 1" in components["hs_hierarchy"]["error"]
+
+
+def test_reload_keeps_vector_store_when_its_load_fails(loaders, monkeypatch):
+    monkeypatch.setattr(router, "load_vector_store", fail)
+
+    generation, components = reload()
+
+    assert generation.number == 2
+    assert (generation.vector_store, generation.retriever, generation.code_retriever) == \
+        ("store", "retriever", "code_retriever")
+    assert generation.cn_headings == {"text": ["8471"]}
+    assert components["vector_store"]["status"] == "failed"
+
+
+def test_startup_without_hierarchy_serves_none(loaders, monkeypatch):
+    monkeypatch.setattr(router, "load_hs_data", fail)
+
+    generation = router.build_search_generation(1)
+
+    assert generation.hierarchy is None
+    assert generation.all_codes == {}
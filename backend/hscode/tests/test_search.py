@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import re
+
+import faiss
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
+from models.hscode import SearchRequest  # noqa: E402
+from hscode.search import HSCodeSearchService  # noqa: E402
+
+DIM = 8
+
+
+def clustered_embeddings(n_rows):
+    """Rows in three well separated clusters, so an IVF index with nprobe=1 sees a third of them"""
+    rng = np.random.default_rng(0)
+    centers = np.eye(DIM, dtype="float32")[:3] * 10
+    vectors = centers[np.arange(n_rows) % 3] + rng.normal(0, 0.01, (n_rows, DIM)).astype("float32")
+    return np.ascontiguousarray(vectors, dtype="float32")
+
+
+@pytest.fixture
+def data_paths(tmp_path):
+    # Every source has a row without an HS code; "abc" keeps df1's codes as strings, as in the real extract
+    pd.DataFrame({
+        "HS Code": ["847130", "84713010", None, "abc"],
+        "Product Name": ["Laptops", "Laptops < 10 kg", "No code", "Bad code"],
+        "Description": ["Portable computers", None, "Missing code", "Anomalous code"],
+        "File Name": ["Chapitre 84.docx", "other.txt", "x.pdf", "y.pdf"],
+    }).to_csv(tmp_path / "df_Extraction_final.csv", index=False)
+    pd.DataFrame({
+        "HS Code": ["84713020", None, "xx"],
+        "Product Name": ["Tablets", "No code", "Not a code"],
+        "Description": ["Tablet computers", "Missing code", "Not a code"],
+        "filename": ["Modification session 3.pdf", "x.pdf", "y.pdf"],
+    }).to_csv(tmp_path / "df1_updated.csv", index=False)
+    pd.DataFrame({
+        "HS Code": ["84", "8471", "8471 30", "", "8471.30 90"],
+        "Product Name": ["Machinery", "Computers", "Portable", "Empty", "Other portable"],
+    }).to_csv(tmp_path / "hs_code.csv", index=False)
+    pd.DataFrame({
+        "filename": ["Chapitre 84.docx", "Modification session 3.pdf"],
+        "content": ["Notes of chapter 84", "Decision text"],
+    }).to_csv(tmp_path / "df_full_content.csv", index=False)
+
+    # Two cleaned df1 rows + three df10 rows + five hs_code.csv rows
+    embeddings = clustered_embeddings(10)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(embeddings)
+    np.save(tmp_path / "embeddings.npy", embeddings)
+    faiss.write_index(index, str(tmp_path / "faiss_index.bin"))
+
+    return {
+        "file1": str(tmp_path / "df_Extraction_final.csv"),
+        "file10": str(tmp_path / "df1_updated.csv"),
+        "file11": str(tmp_path / "hs_code.csv"),
+        "content_file": str(tmp_path / "df_full_content.csv"),
+        "snapshot_dir": str(tmp_path / "snapshot"),
+        "embeddings": str(tmp_path / "embeddings.npy"),
+        "index": str(tmp_path / "faiss_index.bin"),
+        "model": str(tmp_path / "model"),
+    }
+
+
+def load_service(data_paths, use_snapshot=False):
+    service = HSCodeSearchService()
+    service.data_paths = lambda: data_paths
+    assert service.load_data_and_models(use_snapshot=use_snapshot)
+    return service
+
+
+def dump(results):
+    return [result.model_dump() for result in results]
+
+
+def test_loads_csvs_with_empty_hs_codes(data_paths):
+    service = load_service(data_paths)
+
+    assert len(service.combined_codes) == 10
+    assert all(isinstance(code, str) for code in service.combined_codes)
+    assert all(isinstance(code, str) for code in service.code_records)
+    assert service.children_index["847130"] == {"84713010", "84713020", "84713090"}
+
+    results = service.build_nested_results(np.ones(10), np.arange(10))
+    assert [result.HS_Code for result in results] == ["847130"]
+    assert {sous_code["sous_code"] for sous_code in results[0].sous_codes} >= {"10", "20", "90"}
+
+
+def test_snapshot_with_empty_hs_codes_matches_csv_load(data_paths):
+    from_csv = load_service(data_paths, use_snapshot=True)
+    from_snapshot = load_service(data_paths, use_snapshot=True)
+
+    assert "read_csv" not in from_snapshot.load_timings
+    assert list(from_snapshot.combined_codes) == list(from_csv.combined_codes)
+    assert dump(from_snapshot.build_nested_results(np.ones(10), np.arange(10))) == \
+        dump(from_csv.build_nested_results(np.ones(10), np.arange(10)))
+
+
+def test_ivf_search_with_fewer_hits_than_top_k(data_paths):
+    service = load_service(data_paths)
+    embeddings = np.load(data_paths["embeddings"])
+    ivf = faiss.IndexIVFFlat(faiss.IndexFlatL2(DIM), DIM, 3)
+    ivf.train(embeddings)
+    ivf.add(embeddings)
+    ivf.nprobe = 1
+    service.index = ivf
+
+    query = embeddings[:1]
+    scores, indices = ivf.search(query, 10)
+    assert (indices[0] < 0).any()
+    found = indices[0] >= 0
+
+    results = service.search_embeddings([SearchRequest(query="laptop", top_k=10)], query)[0]
+    assert dump(results) == dump(service.build_nested_results(scores[0][found], indices[0][found]))
+
+
+def is_anomalous(code):
+    """Row-by-row rule the vectorized cleaning replaced"""
+    if pd.isnull(code):
+        return True
+    return not re.fullmatch(r"\d{6,10}", str(code).strip())
+
+
+def is_invalid_description(desc):
+    """Row-by-row rule the vectorized cleaning replaced"""
+    if pd.isnull(desc):
+        return True
+    desc_str = str(desc).strip().lower()
+    if len(desc_str) < 5:
+        return True
+    if re.fullmatch(r"[^\w\s]+", desc_str) or re.fullmatch(r"\d+", desc_str):
+        return True
+    return desc_str in ["n/a", "na", "null", "none", "vide"]
+
+
+@pytest.mark.parametrize("codes", [
+    ["847130", " 84713010 ", "12345", "12345678901", None, "abc", "８４７１３０", "٨٤٧١٣٠", "847130\x1c"],
+    [847130, 12345, 847130.0, None],
+])
+def test_hs_code_cleaning_matches_row_by_row_rule(codes):
+    df = pd.DataFrame({"HS Code": codes})
+    cleaned = HSCodeSearchService().supprimer_hs_codes_anormaux(df.copy())
+    assert list(cleaned.index) == list(df.index[~df["HS Code"].apply(is_anomalous)])
+
+
+@pytest.mark.parametrize("descriptions", [
+    ["Portable computers", "abc", "!!!!!!", "12345", " N/A ", None, "ééééé", "İİİ", "ΣΣΣΣΣ", "１２３４５", "\x1cabcdef\x1c"],
+    [12345, 1.5, "Portable computers", None],
+])
+def test_description_check_matches_row_by_row_rule(descriptions):
+    df = pd.DataFrame({"Description": descriptions})
+    flagged = HSCodeSearchService().detect_descriptions_suspectes(df.copy())["Description_Suspecte"]
+    assert flagged.tolist() == df["Description"].apply(is_invalid_description).tolist()
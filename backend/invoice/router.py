@@ -6,6 +6,7 @@ from ollama import chat
 from models.invoice import Invoice
 from core.config import settings
 from core.dependencies import get_current_user
+from core.executors import run_io
 
 router = APIRouter()
 
@@ -57,7 +58,7 @@ async def analyze_invoice(
         f.write(await file.read())
     
     try:
-        invoice = parse_invoice_from_image(temp_filename)
+        invoice = await run_io(parse_invoice_from_image, temp_filename)
         return JSONResponse(invoice.dict())
     except HTTPException as he:
         raise he
@@ -1,8 +1,14 @@
+import asyncio
+
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from core.config import settings
+from core.executors import executor_stats
+from core.model_registry import evict_idle_models, model_registry
+from core.readiness import readiness
 from auth.router import router as auth_router
 from invoice.router import router as invoice_router
 from hscode.router import router as hscode_router
@@ -30,13 +36,41 @@ app.include_router(invoice_router, prefix="/invoice", tags=["Invoice Analysis"])
 app.include_router(hscode_router, prefix="/hscode", tags=["HS Code Analysis"])
 app.include_router(florence_router, prefix="/florence", tags=["Image Processing"])
 
+@app.on_event("startup")
+async def warmup_models():
+    """Load the models listed in MODEL_WARMUP in the background and start idle eviction"""
+    readiness.expect(*(f"model:{name}" for name in settings.MODEL_WARMUP), required=False)
+    app.state.model_warmup = asyncio.create_task(
+        asyncio.to_thread(model_registry.warmup, settings.MODEL_WARMUP, readiness)
+    )
+    app.state.model_eviction = asyncio.create_task(
+        evict_idle_models(model_registry, settings.MODEL_EVICTION_INTERVAL_SECONDS)
+    )
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Douane Analysis API", "version": "1.0.0"}
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up, possibly still loading (see /ready)"""
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once every startup component finished loading, 503 before or if a required one failed"""
+    report = readiness.report()
+    return JSONResponse(content=report, status_code=200 if report["ready"] else 503)
+
+@app.get("/executors")
+async def get_executor_stats():
+    """Concurrency limits and in-flight work of the blocking-work executors"""
+    return executor_stats()
+
+@app.get("/models")
+async def get_model_stats():
+    """Load state, usage and memory of each registered model"""
+    return model_registry.stats()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
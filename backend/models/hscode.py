@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal, Union
 
 class QueryRequest(BaseModel):
     query: str
@@ -26,6 +26,13 @@ class VectorQueryRequest(BaseModel):
 class SearchRequest(BaseModel):
     query: str
     top_k: Optional[int] = 5
+    # "ref" replaces every inlined document by a ContentRef, fetched from /hscode/content/{id}
+    content: Literal["inline", "ref"] = "inline"
+
+class ContentRef(BaseModel):
+    id: str
+    hash: str
+    length: int
 
 class SearchResult(BaseModel):
     HS_Code: str
@@ -33,5 +40,5 @@ class SearchResult(BaseModel):
     File_Name: str
     rubrique: str
     score: float
-    contenu: str
+    contenu: Union[str, ContentRef]
     sous_codes: List[Dict[str, Any]]
\ No newline at end of file